@@ -0,0 +1,147 @@
+"""View and click counts, buffered in memory and flushed as daily rollups.
+
+Recording an event is a dict update. A background task periodically
+turns the accumulated deltas into one unordered ``bulk_write`` of ``$inc``
+upserts, one per (day, kind, id) rollup document, so page traffic never
+turns into a Mongo write per request.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger("portfolio.analytics")
+
+# kind -> events that can be tracked for it
+EVENTS = {
+    "project": ("view", "github", "live"),
+    "blog": ("view",),
+}
+
+ALL_EVENTS = ("view", "github", "live")
+
+# Score used for popularity sorting: a click says more than a view.
+POPULARITY_WEIGHTS = {"view": 1.0, "github": 3.0, "live": 3.0}
+
+Key = Tuple[str, str, str, str]  # (day, kind, id, event)
+
+
+def rollup_id(day: str, kind: str, target_id: str) -> str:
+    return f"{day}:{kind}:{target_id}"
+
+
+def totals_pipeline(match: dict) -> list:
+    """Aggregate rollups matching ``match`` into one row per (kind, id) with a total per event."""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"kind": "$kind", "target_id": "$target_id"},
+            **{event: {"$sum": f"$counts.{event}"} for event in ALL_EVENTS},
+        }},
+    ]
+
+
+class Analytics:
+    """In-memory event counters plus the rollup flush and popularity ranking.
+
+    ``max_keys`` bounds the buffer between flushes; events for new keys
+    beyond it are dropped (and counted in ``dropped``).
+    """
+
+    def __init__(self, max_keys: int, popularity_days: int):
+        self.max_keys = max_keys
+        self.popularity_days = popularity_days
+        self.dropped = 0
+        self._counts: Dict[Key, int] = {}
+        # (kind, id) -> score over the last ``popularity_days``
+        self.popularity: Dict[Tuple[str, str], float] = {}
+
+    def add(self, kind: str, target_id: str, event: str) -> bool:
+        key = (datetime.utcnow().strftime("%Y-%m-%d"), kind, target_id, event)
+        counts = self._counts
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.max_keys:
+            counts[key] = 1
+        else:
+            self.dropped += 1
+            return False
+        return True
+
+    def pending(self) -> int:
+        return sum(self._counts.values())
+
+    def _restore(self, counts: Dict[Key, int]):
+        for key, amount in counts.items():
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    async def flush(self, database) -> int:
+        """Write the buffered deltas. Returns the number of events written.
+
+        On failure the unwritten deltas go back into the buffer for the
+        next flush.
+        """
+        counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        grouped: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        for (day, kind, target_id, event), amount in counts.items():
+            grouped.setdefault((day, kind, target_id), {})[event] = amount
+        keys = list(grouped)
+        ops = [
+            UpdateOne(
+                {"_id": rollup_id(day, kind, target_id)},
+                {
+                    "$inc": {f"counts.{event}": amount for event, amount in grouped[(day, kind, target_id)].items()},
+                    "$setOnInsert": {"day": day, "kind": kind, "target_id": target_id},
+                },
+                upsert=True,
+            )
+            for day, kind, target_id in keys
+        ]
+        try:
+            await database.analytics_daily.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+            self._restore({key: amount for key, amount in counts.items() if key[:3] in failed})
+            logger.warning("Analytics flush: %d of %d rollups failed", len(failed), len(ops))
+            return sum(amount for key, amount in counts.items() if key[:3] not in failed)
+        except (PyMongoError, asyncio.CancelledError):
+            # Cancelled mid-write at shutdown, the final flush retries the batch.
+            # A batch the server had already applied is then counted twice,
+            # which beats losing it.
+            self._restore(counts)
+            raise
+        return sum(counts.values())
+
+    async def refresh_popularity(self, database):
+        since = (datetime.utcnow() - timedelta(days=self.popularity_days)).strftime("%Y-%m-%d")
+        popularity = {}
+        async for row in database.analytics_daily.aggregate(totals_pipeline({"day": {"$gte": since}})):
+            popularity[(row["_id"]["kind"], row["_id"]["target_id"])] = sum(
+                (row.get(event) or 0) * weight for event, weight in POPULARITY_WEIGHTS.items())
+        self.popularity = popularity
+
+    def score(self, kind: str, target_id: str) -> float:
+        return self.popularity.get((kind, target_id), 0.0)
+
+    async def run(self, database, flush_seconds: float, refresh_seconds: float):
+        """Flush every ``flush_seconds`` and re-rank every ``refresh_seconds``.
+
+        Cancelling stops the loop without a final flush; call ``flush``
+        after cancelling so buffered events are not lost.
+        """
+        loop = asyncio.get_running_loop()
+        refreshed_at = loop.time()
+        while True:
+            await asyncio.sleep(flush_seconds)
+            try:
+                await self.flush(database)
+                if loop.time() - refreshed_at >= refresh_seconds:
+                    await self.refresh_popularity(database)
+                    refreshed_at = loop.time()
+            except PyMongoError as e:
+                logger.warning("Analytics flush failed, keeping %d event(s): %s", self.pending(), e)
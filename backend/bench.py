@@ -0,0 +1,452 @@
+"""Load tests and benchmarks for the Portfolio API.
+
+    python bench.py [--mongo memory] [--concurrency 1,8,32] [--duration 5]
+                    [--projects 200 --posts 200 --contacts 2000]
+                    [--output results.json] [--baseline baseline.json]
+
+Every scenario runs at every concurrency level and reports p50/p95/p99
+latency, requests per second and process RSS. The app is driven in-process
+through httpx by default, or through a uvicorn subprocess with ``--uvicorn``.
+
+MongoDB is the server at MONGO_URL, a throwaway ``mongod`` started on a
+temporary directory with ``--mongod``, or mongomock-motor with
+``--mongo memory`` (in-process only). The dataset comes from the synthetic
+generators in seed_data.py. Contact notifications go to a local aiosmtpd
+sink, so nothing leaves the machine.
+
+With ``--baseline`` the run is compared against a stored ``--output`` file
+and the exit status is 1 if any scenario regressed by more than
+``--threshold``.
+
+Needs the packages in requirements-bench.txt.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+ADMIN_EMAIL = "bench@example.com"
+ADMIN_PASSWORD = "bench-password"
+SEARCH_TERMS = ["react", "python fast", "mongo", "docker", "stream", "ser", "tailwind ui", "iot raspberry"]
+BULK_LINES = 100
+MEDIA_RANGE = "bytes=0-65535"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Scenarios: each takes (client, ctx) and performs one request.
+
+def get(path, auth=False):
+    async def request(client, ctx):
+        return await client.get(path, headers=ctx["auth"] if auth else None)
+    return request
+
+
+async def portfolio_revalidate(client, ctx):
+    return await client.get("/api/portfolio", headers={"If-None-Match": ctx["portfolio_etag"]})
+
+
+async def search(client, ctx):
+    return await client.get("/api/search", params={"q": random.choice(SEARCH_TERMS)})
+
+
+async def contact(client, ctx):
+    return await client.post("/api/contact", json={
+        "name": "Bench Visitor",
+        "email": "visitor@example.com",
+        "message": f"Benchmark message {random.random()}",
+    })
+
+
+async def login(client, ctx):
+    return await client.post("/api/admin/login", data={"username": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+
+
+async def contacts_export(client, ctx):
+    return await read_stream(client, "/api/admin/contacts/export", ctx["auth"])
+
+
+async def read_stream(client, path, headers):
+    # Read the whole stream so the measurement includes the body.
+    async with client.stream("GET", path, headers=headers) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+async def blog_post(client, ctx):
+    return await client.get(f"/api/blog/synthetic-post-{random.choice(ctx['published_posts'])}")
+
+
+async def blog_sections(client, ctx):
+    post_id = f"synthetic-post-{random.choice(ctx['published_posts'])}"
+    return await client.get(f"/api/blog/{post_id}/sections", params={"start": 1, "limit": 5})
+
+
+async def media(client, ctx):
+    return await read_stream(client, ctx["media_url"], None)
+
+
+async def media_range(client, ctx):
+    return await read_stream(client, ctx["media_url"], {"Range": MEDIA_RANGE})
+
+
+async def track(client, ctx):
+    project_id = f"synthetic-project-{random.randrange(ctx['projects'])}"
+    return await client.post("/api/track", json={"type": "project", "id": project_id})
+
+
+async def update_project(client, ctx):
+    project_id = f"synthetic-project-{random.randrange(ctx['projects'])}"
+    return await client.put(f"/api/admin/projects/{project_id}", headers=ctx["auth"], json={
+        "title": f"Updated {project_id}",
+        "description": "Updated by the benchmark",
+        "technologies": ["Python"],
+    })
+
+
+async def bulk_projects(client, ctx):
+    first = random.randrange(max(ctx["projects"] - BULK_LINES, 0) + 1)
+    token = random.random()
+    body = "\n".join(json.dumps({
+        "id": f"synthetic-project-{i}",
+        "title": f"Bulk {i}",
+        "description": f"Bulk update {token}",
+        "technologies": ["Python"],
+    }) for i in range(first, min(first + BULK_LINES, ctx["projects"])))
+    return await client.post("/api/admin/projects/bulk", headers=ctx["auth"], content=body)
+
+
+# Create-then-delete pairs keep the dataset the same size however long a
+# scenario runs, so runs stay comparable with a baseline.
+
+async def create_delete_project(client, ctx):
+    created = await client.post("/api/admin/projects", headers=ctx["auth"], json={
+        "title": "Benchmark project",
+        "description": "Created by the benchmark",
+        "technologies": ["Python"],
+    })
+    if created.status_code != 200:
+        return created
+    return await client.delete(f"/api/admin/projects/{created.json()['id']}", headers=ctx["auth"])
+
+
+async def create_delete_blog_post(client, ctx):
+    created = await client.post("/api/admin/blog", headers=ctx["auth"], json={
+        "title": "Benchmark post",
+        "content": "# Benchmark\n\nCreated by the benchmark.\n\n## Details\n\nSome *markdown*.",
+        "excerpt": "Created by the benchmark",
+        "published": True,
+    })
+    if created.status_code != 200:
+        return created
+    # There is no single-post delete route; admins remove posts through bulk.
+    line = json.dumps({"op": "delete", "id": created.json()["id"]})
+    return await client.post("/api/admin/blog/bulk", headers=ctx["auth"], content=line)
+
+
+SCENARIOS = {
+    "projects": get("/api/projects"),
+    "projects_page": get("/api/projects?limit=20&fields=title,technologies"),
+    "blog": get("/api/blog"),
+    "blog_summaries": get("/api/blog?limit=20&fields=title,excerpt,tags"),
+    "blog_post": blog_post,
+    "blog_sections": blog_sections,
+    "media": media,
+    "media_range": media_range,
+    "track": track,
+    "skills": get("/api/skills"),
+    "experience": get("/api/experience"),
+    "portfolio": get("/api/portfolio"),
+    "portfolio_304": portfolio_revalidate,
+    "search": search,
+    "contact": contact,
+    "login": login,
+    "admin_contacts_page": get("/api/admin/contacts?limit=50", auth=True),
+    "contacts_export": contacts_export,
+    "update_project": update_project,
+    "bulk_projects": bulk_projects,
+    "create_delete_project": create_delete_project,
+    "create_delete_blog_post": create_delete_blog_post,
+    "admin_analytics": get("/api/admin/analytics", auth=True),
+}
+
+# Weighted read/write mix resembling real traffic.
+MIXED = [
+    ("portfolio", 30), ("portfolio_304", 20), ("blog_summaries", 15), ("projects_page", 10),
+    ("search", 15), ("contact", 5), ("update_project", 3), ("login", 2),
+]
+
+
+async def mixed(client, ctx):
+    name = random.choices([n for n, _ in MIXED], weights=[w for _, w in MIXED])[0]
+    return await SCENARIOS[name](client, ctx)
+
+SCENARIOS["mixed"] = mixed
+
+
+async def run_scenario(client, name, ctx, concurrency, duration, pid):
+    request = SCENARIOS[name]
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await request(client, ctx)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError:
+                statuses["error"] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+            # In-process there is no socket wait; let background tasks run.
+            await asyncio.sleep(0)
+
+    rss_before = rss_mb(pid)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    errors = statuses["error"] + sum(count for code, count in statuses.items() if code != "error" and code >= 500)
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in statuses.items()},
+        "rss_mb": round(rss_mb(pid), 1),
+        "rss_delta_mb": round(rss_mb(pid) - rss_before, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print regressions against a baseline run; returns True if any were found."""
+    previous = {f"{r['scenario']}@{r['concurrency']}": r for r in baseline["results"]}
+    regressed = False
+    for result in results:
+        key = f"{result['scenario']}@{result['concurrency']}"
+        base = previous.get(key)
+        if base is None:
+            continue
+        problems = []
+        if result["p99_ms"] > base["p99_ms"] * (1 + threshold):
+            problems.append(f"p99 {base['p99_ms']} -> {result['p99_ms']} ms")
+        if result["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"rps {base['rps']} -> {result['rps']}")
+        if problems:
+            regressed = True
+            print(f"REGRESSION {key}: {', '.join(problems)}")
+    return regressed
+
+
+def start_mongod():
+    binary = shutil.which("mongod")
+    if binary is None:
+        sys.exit("--mongod needs a mongod binary on PATH")
+    dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+    port = free_port()
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL,
+    )
+    os.environ["MONGO_URL"] = f"mongodb://127.0.0.1:{port}"
+    return process, dbpath
+
+
+def start_smtp_sink():
+    from aiosmtpd.controller import Controller
+
+    class Sink:
+        received = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            Sink.received += 1
+            return "250 OK"
+
+    port = free_port()
+    controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+    controller.start()
+    os.environ.update(SMTP_SERVER="127.0.0.1", SMTP_PORT=str(port), SMTP_STARTTLS="false", SMTP_USER="")
+    return controller, Sink
+
+
+async def seed(database, args):
+    import seed_data
+    for collection, docs in {
+        "projects": seed_data.synthetic_projects(args.projects),
+        "blog_posts": seed_data.rendered_posts(seed_data.synthetic_posts(args.posts)),
+        "contacts": seed_data.synthetic_contacts(args.contacts),
+        "skills": seed_data.SAMPLE_SKILLS,
+        "experiences": seed_data.SAMPLE_EXPERIENCES,
+    }.items():
+        await seed_data.upsert_changed(database, collection, docs)
+
+
+async def upload_image(client, auth):
+    """Upload a generated photo-sized image and return the URL of its original."""
+    import io
+    from PIL import Image
+    image = Image.effect_noise((1600, 1200), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    response = await client.post("/api/admin/media", headers=auth,
+                                 files={"file": ("bench.jpg", buffer.getvalue(), "image/jpeg")})
+    response.raise_for_status()
+    return response.json()["original_url"]
+
+
+async def wait_until_up(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    sys.exit("uvicorn did not come up")
+
+
+async def main(args):
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    os.environ.update(ADMIN_EMAIL=ADMIN_EMAIL, ADMIN_PASSWORD=ADMIN_PASSWORD, GMAIL_USER="owner@example.com")
+    # Every request comes from one address: keep admission control in the
+    # path, but with limits the load generator cannot reach.
+    for prefix in ("CONTACT", "LOGIN", "TRACK"):
+        for name in ("RATE_PER_MINUTE", "BURST", "GLOBAL_RATE_PER_MINUTE", "MAX_IN_FLIGHT"):
+            os.environ.setdefault(f"{prefix}_{name}", "1000000000")
+    mongod = start_mongod() if args.mongod else None
+    smtp, sink = start_smtp_sink()
+
+    import server  # settings are read at import, after the environment is prepared
+    patches = contextlib.ExitStack()
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient, enabled_gridfs_integration
+        patches.enter_context(enabled_gridfs_integration())  # media is stored in GridFS
+        server.client = AsyncMongoMockClient()
+        server.db = server.client.portfolio_db
+    await seed(server.db, args)
+
+    uvicorn = None
+    if args.uvicorn:
+        port = free_port()
+        uvicorn = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60)
+        await wait_until_up(client)
+        pid = uvicorn.pid
+    else:
+        await server.app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=60)
+        pid = "self"
+
+    results = []
+    try:
+        token = (await login(client, {})).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        ctx = {
+            "auth": auth,
+            "portfolio_etag": (await client.get("/api/portfolio")).headers["etag"],
+            "projects": max(args.projects, 1),
+            # Every fifth synthetic post is a draft.
+            "published_posts": [i for i in range(args.posts) if i % 5] or [1],
+            "media_url": await upload_image(client, auth),
+        }
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_scenario(client, name, ctx, concurrency, args.duration, pid)
+                results.append(result)
+                print(f"{name:<20} c={concurrency:<4} rps={result['rps']:<9} p50={result['p50_ms']:<8} "
+                      f"p95={result['p95_ms']:<8} p99={result['p99_ms']:<9} errors={result['errors']:<4} "
+                      f"rss={result['rss_mb']}MB")
+    finally:
+        await client.aclose()
+        if uvicorn is not None:
+            uvicorn.terminate()
+            uvicorn.wait()
+        else:
+            await server.app.router.shutdown()
+        smtp.stop()
+        patches.close()
+        if mongod is not None:
+            mongod[0].terminate()
+            mongod[0].wait()
+            shutil.rmtree(mongod[1], ignore_errors=True)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "emails_received": sink.received,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            if compare(results, json.load(baseline), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", choices=["url", "memory"], default="url")
+    parser.add_argument("--mongod", action="store_true", help="start a throwaway mongod for this run")
+    parser.add_argument("--uvicorn", action="store_true", help="benchmark through a uvicorn subprocess")
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--contacts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5, help="seconds per scenario and concurrency level")
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS))
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+    if args.mongo == "memory" and (args.uvicorn or args.mongod):
+        parser.error("--mongo memory only works in-process without --mongod")
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sys.exit(asyncio.run(main(args)))
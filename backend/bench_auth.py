@@ -0,0 +1,85 @@
+"""Public endpoint latency while admin logins run in parallel.
+
+    python bench_auth.py [--blocking] [--logins 8] [--seconds 5]
+
+``--blocking`` verifies passwords inline on the event loop, the way the
+login handler used to, so the same run can be repeated for a before/after
+comparison. The app is driven in-process through httpx; it talks to the
+MongoDB at MONGO_URL, or to mongomock-motor with ``--mongo memory``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+import server
+from bench import percentile
+
+ADMIN_EMAIL = os.getenv("ADMIN_EMAIL") or "admin@example.com"
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD") or "bench-password"
+
+async def login_loop(client, stop):
+    while not stop.is_set():
+        await client.post("/api/admin/login", data={"username": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        # An in-process transport has no network wait, so yield explicitly.
+        await asyncio.sleep(0)
+
+async def public_latencies(client, seconds, concurrency=4, interval=0.005):
+    samples = []
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        # Latency is measured from when each request was due, not from when
+        # the stalled event loop got round to sending it.
+        due = time.perf_counter()
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(max(0, due - time.perf_counter()))
+            response = await client.get("/api/skills")
+            samples.append((time.perf_counter() - due) * 1000)
+            response.raise_for_status()
+            due += interval
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+def report(label, samples):
+    print(f"{label:<24} n={len(samples):<6} p50={percentile(samples, 50):8.2f}ms  "
+          f"p99={percentile(samples, 99):8.2f}ms  mean={statistics.mean(samples):8.2f}ms")
+
+async def main(args):
+    os.environ["ADMIN_EMAIL"] = ADMIN_EMAIL
+    os.environ["ADMIN_PASSWORD"] = ADMIN_PASSWORD
+    # The login loop would otherwise be rate limited within a second.
+    server.RATE_LIMIT_SETTINGS["ENABLED"] = False
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client.portfolio_db
+    if args.blocking:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        server.run_hash = run_inline
+
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            report("idle", await public_latencies(client, args.seconds))
+            stop = asyncio.Event()
+            logins = [asyncio.create_task(login_loop(client, stop)) for _ in range(args.logins)]
+            report(f"{args.logins} parallel logins", await public_latencies(client, args.seconds))
+            stop.set()
+            await asyncio.gather(*logins)
+    finally:
+        await server.app.router.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocking", action="store_true", help="verify passwords on the event loop")
+    parser.add_argument("--logins", type=int, default=8, help="concurrent login loops")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each phase")
+    parser.add_argument("--mongo", choices=["url", "memory"], default="url")
+    asyncio.run(main(parser.parse_args()))
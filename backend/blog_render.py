@@ -0,0 +1,118 @@
+"""Markdown rendering for blog posts.
+
+Posts are rendered once, when they are written. The stored result is a
+list of HTML sections split at top-level headings, so a long article can
+be sent a few sections at a time and no request ever parses Markdown.
+
+Raw HTML in the source is escaped rather than passed through, and links
+with unsafe schemes (``javascript:`` and friends) are left as text, so the
+output can be inserted into the page as is.
+"""
+import hashlib
+import re
+import unicodedata
+from typing import List
+
+# Bump when the rendering rules change; posts stored with an older
+# version are rendered again at startup.
+RENDER_VERSION = 1
+
+WORDS_PER_MINUTE = 200
+
+# Headings that start a new section when they are not nested in a list or quote.
+SECTION_TAGS = ("h1", "h2")
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+MAX_SLUG_LENGTH = 80
+
+_markdown = None
+
+
+def render_link_open(self, tokens, idx, options, env):
+    token = tokens[idx]
+    if str(token.attrGet("href") or "").startswith(("http://", "https://")):
+        token.attrSet("rel", "nofollow noopener noreferrer")
+    return self.renderToken(tokens, idx, options, env)
+
+
+def markdown():
+    """The shared parser, built on first use.
+
+    Posts are rendered when they are written, so most worker processes
+    never need markdown-it; the server imports this module for
+    ``RENDER_VERSION`` and ``slugify`` alone.
+    """
+    global _markdown
+    if _markdown is None:
+        from markdown_it import MarkdownIt
+        parser = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+        parser.add_render_rule("link_open", render_link_open)
+        _markdown = parser
+    return _markdown
+
+
+def slugify(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return SLUG_RE.sub("-", ascii_text.lower()).strip("-")[:MAX_SLUG_LENGTH].rstrip("-")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def count_words(tokens) -> int:
+    return sum(len(WORD_RE.findall(t.content)) for t in tokens if t.type in ("inline", "fence", "code_block"))
+
+
+def render_post(content: str) -> dict:
+    """Render Markdown ``content`` into the fields stored with a post.
+
+    Returns ``sections`` (``id``, ``title``, ``html``, ``words``), a
+    ``toc`` of section ids and titles, ``word_count``, ``reading_time`` in
+    minutes, ``content_hash`` and ``render_version``.
+    """
+    md = markdown()
+    env = {}
+    tokens = md.parse(content, env)
+    anchors = set()
+    starts = []
+    for index, token in enumerate(tokens):
+        if token.type != "heading_open":
+            continue
+        title = "".join(child.content for child in tokens[index + 1].children or ()
+                        if child.type in ("text", "code_inline"))
+        anchor = base = slugify(title) or "section"
+        suffix = 2
+        while anchor in anchors:
+            anchor = f"{base}-{suffix}"
+            suffix += 1
+        anchors.add(anchor)
+        token.attrSet("id", anchor)
+        if token.level == 0 and token.tag in SECTION_TAGS:
+            starts.append((index, anchor, title))
+
+    # Anything before the first heading becomes an untitled introduction.
+    if not starts or starts[0][0] > 0:
+        starts.insert(0, (0, "intro", None))
+    sections: List[dict] = []
+    for position, (start, anchor, title) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(tokens)
+        chunk = tokens[start:end]
+        sections.append({
+            "id": anchor,
+            "title": title,
+            "html": md.renderer.render(chunk, md.options, env),
+            "words": count_words(chunk),
+        })
+    sections = [section for section in sections if section["html"]]
+
+    word_count = sum(section["words"] for section in sections)
+    return {
+        "sections": sections,
+        "toc": [{"id": section["id"], "title": section["title"]} for section in sections],
+        "word_count": word_count,
+        "reading_time": max(1, round(word_count / WORDS_PER_MINUTE)),
+        "content_hash": content_hash(content),
+        "render_version": RENDER_VERSION,
+    }
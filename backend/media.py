@@ -0,0 +1,103 @@
+"""Image variants and byte ranges for the media store.
+
+Uploads are decoded once and re-encoded at a few widths in WebP and JPEG,
+so pages can pick a size with ``srcset`` instead of loading the original.
+"""
+import re
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# format -> (Pillow format, content type, save options)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaError(ValueError):
+    pass
+
+
+def variant_widths(width: int) -> List[int]:
+    """Configured widths below the original, plus the original when it is narrower than the largest."""
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    if width <= VARIANT_WIDTHS[-1]:
+        widths.append(width)
+    return widths or [VARIANT_WIDTHS[-1]]
+
+
+def render_variants(data: bytes) -> Tuple[dict, List[dict]]:
+    """Decode an uploaded image and encode every width/format variant.
+
+    Returns ``(info, variants)`` where ``info`` describes the original and
+    each variant has ``width``, ``height``, ``format``, ``content_type`` and
+    ``data``. CPU bound: run it off the event loop.
+    """
+    # Pillow is only needed for uploads; serving media is just byte ranges.
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        with Image.open(BytesIO(data)) as source:
+            source_format = source.format
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise MediaError(f"Not a supported image: {e}")
+
+    width, height = image.size
+    info = {"width": width, "height": height, "content_type": Image.MIME.get(source_format, "application/octet-stream")}
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    variants = []
+    for target_width in variant_widths(width):
+        target_height = max(1, round(height * target_width / width))
+        resized = image if target_width == width else image.resize((target_width, target_height), Image.LANCZOS)
+        for name, (pil_format, content_type, options) in VARIANT_FORMATS.items():
+            frame = resized
+            if pil_format == "JPEG" and resized.mode == "RGBA":
+                # JPEG has no alpha channel; flatten onto white.
+                flattened = Image.new("RGB", resized.size, (255, 255, 255))
+                flattened.paste(resized, mask=resized.getchannel("A"))
+                frame = flattened
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            variants.append({
+                "width": target_width,
+                "height": target_height,
+                "format": name,
+                "content_type": content_type,
+                "data": buffer.getvalue(),
+            })
+    return info, variants
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``Range: bytes=`` header into an inclusive ``(start, end)``.
+
+    Returns None when the header is absent or not a single valid byte
+    range, such as ``bytes=5-2`` (the whole body is served then), and
+    raises MediaError when it cannot be satisfied, which includes any
+    range of an empty file.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None
+    if first == "":
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise MediaError("Suffix range not satisfiable")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if start >= size:
+        raise MediaError("Range not satisfiable")
+    return start, min(int(last), size - 1) if last else size - 1
@@ -0,0 +1,266 @@
+"""Process-local metrics in the Prometheus text exposition format.
+
+Counters and histograms are updated from the event loop and from the
+threads pymongo and the bcrypt pool run in, so every update takes a lock.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger("portfolio.metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.label_names, labels, 'le="' + le + '"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total:g}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP responses by route and status.", ["method", "route", "status"])
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"])
+mongo_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency.", ["collection", "command"])
+mongo_failures = registry.counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed.", ["collection", "command"])
+mongo_slow = registry.counter(
+    "mongodb_slow_commands_total", "MongoDB commands above the slow threshold.", ["collection", "command"])
+mongo_documents = registry.counter(
+    "mongodb_documents_returned_total", "Documents returned by find/getMore/aggregate.", ["collection", "command"])
+email_duration = registry.histogram(
+    "email_send_duration_seconds", "SMTP send latency.", ["outcome"])
+bcrypt_duration = registry.histogram(
+    "bcrypt_duration_seconds", "Password hash/verify latency, including pool wait.", ["operation"])
+analytics_events = registry.counter(
+    "analytics_events_total", "Tracked views/clicks by outcome (buffered or dropped).", ["type", "event", "outcome"])
+admission_rejections = registry.counter(
+    "admission_rejections_total", "Requests rejected with 429 by admission control.", ["endpoint", "reason"])
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Per-collection/command timings for every command the client sends."""
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self._pending: Dict[Tuple, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        command = event.command_name
+        collection = event.command.get(command)
+        if command == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        with self._lock:
+            self._pending[self._key(event)] = (collection, command)
+
+    def _finish(self, event):
+        with self._lock:
+            labels = self._pending.pop(self._key(event), ("-", event.command_name))
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, *labels)
+        if seconds * 1000 >= self.slow_ms:
+            mongo_slow.inc(*labels)
+            logger.warning("Slow MongoDB %s on %s: %.1f ms", labels[1], labels[0], seconds * 1000)
+        return labels
+
+    def succeeded(self, event):
+        labels = self._finish(event)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", ()))
+            if batch:
+                mongo_documents.inc(*labels, amount=len(batch))
+
+    def failed(self, event):
+        mongo_failures.inc(*self._finish(event))
+
+
+class SampledProfiler:
+    """cProfile a random fraction of requests into one aggregated stats file.
+
+    With ``rate`` 0 (the default) ``sample()`` is a single comparison.
+    """
+
+    def __init__(self, rate: float, output: str, dump_every: int = 50):
+        self.rate = rate
+        self.output = output
+        self.dump_every = dump_every
+        self._stats: Optional[pstats.Stats] = None
+        self._samples = 0
+        self._active = False
+
+    def sample(self) -> Optional[cProfile.Profile]:
+        # Only one profile at a time: cProfile hooks the whole thread.
+        if self.rate <= 0 or self._active or random.random() >= self.rate:
+            return None
+        self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile: cProfile.Profile):
+        profile.disable()
+        self._active = False
+        if self._stats is None:
+            self._stats = pstats.Stats(profile)
+        else:
+            self._stats.add(profile)
+        self._samples += 1
+        if self._samples % self.dump_every == 0:
+            self.dump()
+
+    def dump(self):
+        if self._stats is not None:
+            self._stats.dump_stats(self.output)
+
+
+profiler = SampledProfiler(
+    float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    os.getenv("PROFILE_OUTPUT", "requests.prof"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template.
+
+    Timing covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+        profile = profiler.sample()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile is not None:
+                profiler.finish(profile)
+            # The router stores the matched route in the scope; using its path
+            # template keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_duration.observe(time.perf_counter() - started, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status_code))
@@ -0,0 +1,120 @@
+"""Token buckets and duplicate suppression for admission control.
+
+The in-process classes decide with a dict lookup and a little arithmetic,
+so they can sit in front of every request. The Mongo-backed ones share
+state between workers at the cost of a round trip, and are optional.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class TokenBucket:
+    """Per-key token buckets refilled at ``rate`` tokens per second up to ``burst``.
+
+    Idle keys are evicted least-recently-used first once ``max_keys`` is
+    reached; an evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens. Returns 0 if allowed, else the seconds to wait."""
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate if self.rate > 0 else float("inf")
+
+
+class DuplicateFilter:
+    """Remembers digests for ``window`` seconds."""
+
+    def __init__(self, window: float, max_entries: int = 10000, clock=time.monotonic):
+        self.window = window
+        self.max_entries = max_entries
+        self.clock = clock
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def seen(self, digest: str) -> bool:
+        """Record ``digest``; True if it was already recorded within the window."""
+        now = self.clock()
+        while self._seen:
+            oldest, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) < self.max_entries:
+                break
+            del self._seen[oldest]
+        if digest in self._seen:
+            return True
+        self._seen[digest] = now + self.window
+        return False
+
+    def forget(self, digest: str):
+        self._seen.pop(digest, None)
+
+
+class MongoWindowLimiter:
+    """Fixed-window counters in a Mongo collection, shared by every worker.
+
+    The collection wants a TTL index on ``expires_at``.
+    """
+
+    def __init__(self, collection, limit: int, window: float):
+        self.collection = collection
+        self.limit = limit
+        self.window = window
+
+    async def take(self, key: str) -> float:
+        now = time.time()
+        window_start = now - now % self.window
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"{key}:{int(window_start)}"},
+            {"$inc": {"count": 1},
+             "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(window_start + self.window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["count"] <= self.limit:
+            return 0.0
+        return window_start + self.window - now
+
+
+class MongoDuplicateFilter:
+    """``DuplicateFilter`` backed by a Mongo collection with a TTL index."""
+
+    def __init__(self, collection, window: float):
+        self.collection = collection
+        self.window = window
+
+    async def seen(self, digest: str) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.window)
+        try:
+            await self.collection.insert_one({"_id": digest, "expires_at": expires_at})
+            return False
+        except DuplicateKeyError:
+            # The TTL monitor only runs once a minute, so the existing entry
+            # may already be past its window.
+            result = await self.collection.update_one(
+                {"_id": digest, "expires_at": {"$lte": now}}, {"$set": {"expires_at": expires_at}})
+            return result.modified_count == 0
+
+    async def forget(self, digest: str):
+        await self.collection.delete_one({"_id": digest})
@@ -0,0 +1,433 @@
+"""In-process full-text index for the public search endpoint.
+
+Documents are kept in an inverted index scored with BM25 over weighted
+fields. The index knows nothing about Mongo: the API adds and removes
+documents as content is written, and queries never leave memory.
+
+Every term keeps its length-normalised term frequencies ("impacts";
+BM25 without the idf, which is the same for every document of a term and
+applied at query time) ranked best first, for each kind and overall. A
+query walks those lists from the top and stops once no document it has
+not seen can beat the k-th best it has (Fagin's threshold algorithm), so
+a broad term costs about as much as a narrow one. Writes patch the lists
+of the terms they touch; the lists are only rescored once the average
+document length they were computed with drifts by more than
+STATS_TOLERANCE.
+
+Facet counts are exact whenever ``total`` is: a single-term query reads
+counts kept per term (built on first use, then patched by writes), and a
+query whose match set is enumerated counts over that set. Otherwise they
+cover the best FACET_DEPTH hits and ``facets_exact`` is false.
+"""
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain, islice, repeat
+from operator import itemgetter, mul
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in is it its of on or that
+the this to was were will with you your
+""".split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Prefix expansions score a little below an exact term match, and a short
+# prefix is not expanded to more than this many terms.
+PREFIX_WEIGHT = 0.8
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 64
+
+# Impacts are normalised by the average document length of the moment they
+# were computed, and recomputed once it has moved by more than this fraction.
+STATS_TOLERANCE = 0.1
+
+# A query stops after scoring this many documents even if the threshold
+# has not been met, which happens when many documents score alike; the
+# best of those scored are returned. Lists are read SCAN_CHUNK at a time.
+SCAN_LIMIT = 600
+SCAN_CHUNK = 16
+
+# When the match set is too large to enumerate, facets are counted over
+# this many of the best hits instead.
+FACET_DEPTH = 50
+
+# A multi-term ``total`` is counted exactly up to this many postings; above
+# it the response carries a lower bound and ``total_exact: false``.
+EXACT_TOTAL_POSTINGS = 5000
+
+# Query results are memoised until the next write.
+RESULT_CACHE_SIZE = 512
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class IndexedDocument:
+    __slots__ = ("key", "kind", "doc_id", "terms", "length", "facets", "summary")
+
+    def __init__(self, key, kind, doc_id, terms, length, facets, summary):
+        self.key = key
+        self.kind = kind
+        self.doc_id = doc_id
+        self.terms = terms
+        self.length = length
+        self.facets = facets
+        self.summary = summary
+
+
+class TermImpacts:
+    """One term's impact per document, and its keys ranked best first per kind and overall (``None``)."""
+
+    __slots__ = ("impacts", "ranked")
+
+    def __init__(self):
+        self.impacts: Dict[int, float] = {}
+        self.ranked: Dict[Optional[str], List[int]] = {}
+
+    def rank_key(self):
+        # Ties stay in key order: keys are allocated in increasing order and
+        # the stable sort in _score_term keeps them so. Including the key
+        # lets remove find a document among many equal impacts by bisection.
+        impacts = self.impacts
+        return lambda key: (-impacts[key], key)
+
+
+def scored(impacts: Dict[int, float], weight: float, ranked: List[int]) -> Iterator[Tuple[float, int]]:
+    """``(impact * weight, key)`` down a ranked list, iterated in C."""
+    return zip(map(mul, map(impacts.__getitem__, ranked), repeat(weight)), ranked)
+
+
+class SearchIndex:
+    """Inverted index over documents of several kinds (projects, blog posts).
+
+    ``fields`` maps a kind to ``{field: weight}``; a field value may be a
+    string or a list of strings. ``facets`` maps a kind to the list fields
+    whose values are counted for every query.
+    """
+
+    def __init__(self, fields: Dict[str, Dict[str, float]], facets: Dict[str, List[str]]):
+        self.fields = fields
+        self.facets = facets
+        self.versions: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._vocabulary: List[str] = []
+        self._docs: Dict[int, IndexedDocument] = {}
+        self._keys: Dict[tuple, int] = {}
+        self._next_key = 0
+        self._total_length = 0.0
+        # Average document length the impacts below are normalised by
+        self._average_length = 0.0
+        self._impacts: Dict[str, TermImpacts] = {}
+        # facet -> key -> values, for counting without touching the documents
+        self._facet_values: Dict[str, Dict[int, list]] = {}
+        # term -> kind -> facet -> value counts over every document of the term
+        self._facet_counts: Dict[str, Dict[str, Dict[str, Counter]]] = {}
+        self._results: "OrderedDict[tuple, dict]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, kind_and_id: tuple) -> bool:
+        return kind_and_id in self._keys
+
+    def _changed(self):
+        self._results.clear()
+
+    def _check_stats(self):
+        """Drop every term's impacts once the average length has drifted too far from the one they used."""
+        average = self._total_length / len(self._docs) if self._docs else 0.0
+        if abs(average - self._average_length) > STATS_TOLERANCE * self._average_length or not average:
+            self._average_length = average or 1.0
+            self._impacts.clear()
+
+    def _impact(self, tf: float, length: float) -> float:
+        return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self._average_length))
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings[term])
+        return math.log(1 + (len(self._docs) - df + 0.5) / (df + 0.5))
+
+    def _analyze(self, kind: str, doc: dict):
+        terms = Counter()
+        for field, weight in self.fields[kind].items():
+            value = doc.get(field) or ""
+            text = " ".join(value) if isinstance(value, list) else str(value)
+            for token in tokenize(text):
+                terms[token] += weight
+        facets = {name: list(doc.get(name) or []) for name in self.facets.get(kind, [])}
+        return dict(terms), facets
+
+    def _insert(self, kind: str, doc_id: str, terms: Dict[str, float], facets: dict, summary: dict,
+                sort_vocabulary: bool = True) -> int:
+        key = self._next_key
+        self._next_key += 1
+        length = sum(terms.values())
+        self._docs[key] = IndexedDocument(key, kind, doc_id, terms, length, facets, summary)
+        self._keys[(kind, doc_id)] = key
+        self._total_length += length
+        for name, values in facets.items():
+            self._facet_values.setdefault(name, {})[key] = values
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if sort_vocabulary:
+                    insort(self._vocabulary, term)
+            postings[key] = tf
+        return key
+
+    def add(self, kind: str, doc: dict, summary: dict):
+        """Index ``doc`` (replacing any previous version with the same id)."""
+        self.remove(kind, doc["id"])
+        key = self._insert(kind, doc["id"], *self._analyze(kind, doc), summary)
+        self._check_stats()
+        length = self._docs[key].length
+        facets = self._docs[key].facets
+        for term, tf in self._docs[key].terms.items():
+            counts = self._facet_counts.get(term)
+            if counts is not None:
+                by_name = counts.setdefault(kind, {})
+                for name, values in facets.items():
+                    by_name.setdefault(name, Counter()).update(values)
+            entry = self._impacts.get(term)
+            if entry is not None:
+                entry.impacts[key] = self._impact(tf, length)
+                rank_key = entry.rank_key()
+                insort(entry.ranked.setdefault(kind, []), key, key=rank_key)
+                insort(entry.ranked[None], key, key=rank_key)
+        self._changed()
+
+    def remove(self, kind: str, doc_id: str):
+        key = self._keys.pop((kind, doc_id), None)
+        if key is None:
+            return
+        doc = self._docs.pop(key)
+        self._total_length -= doc.length
+        for name in doc.facets:
+            del self._facet_values[name][key]
+        for term in doc.terms:
+            counts = self._facet_counts.get(term)
+            if counts is not None:
+                for name, values in doc.facets.items():
+                    counter = counts[kind][name]
+                    for value in values:
+                        counter[value] -= 1
+                        if not counter[value]:
+                            del counter[value]
+            entry = self._impacts.get(term)
+            if entry is not None:
+                rank_key = entry.rank_key()
+                for ranked in (entry.ranked[kind], entry.ranked[None]):
+                    del ranked[bisect_left(ranked, (-entry.impacts[key], key), key=rank_key)]
+                del entry.impacts[key]
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+                self._impacts.pop(term, None)
+                self._facet_counts.pop(term, None)
+        self._check_stats()
+        self._changed()
+
+    def carry_over(self, kinds: Iterable[str]) -> tuple:
+        """The documents and versions of every kind not in ``kinds``, for ``rebuild``.
+
+        Call it from the thread that writes to this index.
+        """
+        kinds = set(kinds)
+        return ([doc for doc in self._docs.values() if doc.kind not in kinds],
+                {kind: version for kind, version in self.versions.items() if kind not in kinds})
+
+    def rebuild(self, carried: tuple, replacements: Dict[str, tuple]) -> "SearchIndex":
+        """A new index holding ``carried`` plus, for each kind in ``replacements``,
+        the ``(doc, summary)`` pairs and version given as ``(pairs, version)``.
+
+        Nothing in this index is read but its settings, so the build can run
+        in a worker thread while this index keeps answering queries, and be
+        swapped in with one assignment once it is done. Impacts and facet
+        counts are computed up front, so the first queries against the new
+        index are not cold.
+        """
+        index = SearchIndex(self.fields, self.facets)
+        documents, versions = carried
+        for doc in documents:
+            index._insert(doc.kind, doc.doc_id, doc.terms, doc.facets, doc.summary, sort_vocabulary=False)
+        for kind, (pairs, version) in replacements.items():
+            for doc, summary in pairs:
+                if (kind, doc["id"]) in index._keys:
+                    continue
+                index._insert(kind, doc["id"], *index._analyze(kind, doc), summary, sort_vocabulary=False)
+            versions[kind] = version
+        index._vocabulary = sorted(index._postings)
+        index.versions = versions
+        index._check_stats()
+        for term in index._vocabulary:
+            index._score_term(term)
+            index._count_term_facets(term)
+        return index
+
+    def _expand(self, token: str, prefix: bool):
+        if token in self._postings:
+            yield token, 1.0
+        if not prefix or len(token) < MIN_PREFIX_LENGTH:
+            return
+        start = bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:start + MAX_PREFIX_TERMS + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                yield term, PREFIX_WEIGHT
+
+    def _score_term(self, term: str) -> TermImpacts:
+        docs = self._docs
+        entry = TermImpacts()
+        impacts = entry.impacts
+        for key, tf in self._postings[term].items():
+            impacts[key] = self._impact(tf, docs[key].length)
+        ranked = entry.ranked[None] = sorted(impacts, key=impacts.__getitem__, reverse=True)
+        for key in ranked:
+            entry.ranked.setdefault(docs[key].kind, []).append(key)
+        self._impacts[term] = entry
+        return entry
+
+    def _term_impacts(self, term: str) -> TermImpacts:
+        entry = self._impacts.get(term)
+        return entry if entry is not None else self._score_term(term)
+
+    def _count_term_facets(self, term: str) -> Dict[str, Dict[str, Counter]]:
+        counts = self._facet_counts[term] = {}
+        for doc_kind, keys in self._term_impacts(term).ranked.items():
+            if doc_kind is not None:
+                counts[doc_kind] = {
+                    name: Counter(chain.from_iterable(map(self._facet_values[name].__getitem__, keys)))
+                    for name in self.facets.get(doc_kind, [])
+                }
+        return counts
+
+    def _term_facets(self, term: str, kind: Optional[str]) -> Dict[str, Counter]:
+        counts = self._facet_counts.get(term)
+        if counts is None:
+            counts = self._count_term_facets(term)
+        if kind is not None:
+            return counts.get(kind, {})
+        merged = defaultdict(Counter)
+        for by_name in counts.values():
+            for name, counter in by_name.items():
+                merged[name].update(counter)
+        return merged
+
+    def _count_facets(self, keys: Iterable[int]) -> Dict[str, Counter]:
+        keys = list(keys)
+        return {name: Counter(chain.from_iterable(filter(None, map(values.get, keys))))
+                for name, values in self._facet_values.items()}
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None, prefix: bool = True) -> dict:
+        """Rank documents for ``query``.
+
+        When ``prefix`` is set the last query token also matches longer
+        terms, so partial input ("fast" -> "fastapi") works for type-ahead.
+        When ``total_exact`` is false, ``total`` is a lower bound and the
+        facets (``facets_exact`` false) only cover the best FACET_DEPTH hits.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self._docs:
+            return {"total": 0, "total_exact": True, "results": [], "facets": {}, "facets_exact": True}
+        cache_key = (tuple(tokens), limit, kind, prefix)
+        result = self._results.get(cache_key)
+        if result is not None:
+            self._results.move_to_end(cache_key)
+            return result
+
+        # Per query token: the (impacts, weight * idf) of each term it
+        # matches, and one stream of (score, key) over all of them, best first.
+        scorers = []
+        streams = []
+        ranked_lists = []
+        for position, token in enumerate(tokens):
+            terms = list(self._expand(token, prefix and position == len(tokens) - 1))
+            expansions = [(self._term_impacts(term), weight * self._idf(term)) for term, weight in terms]
+            lists = [(entry.impacts, weight, entry.ranked[kind])
+                     for entry, weight in expansions if entry.ranked.get(kind)]
+            if not lists:
+                continue
+            only_term = terms[0][0] if len(terms) == 1 else None
+            scorers.append([(entry.impacts, weight) for entry, weight in expansions])
+            iterables = [scored(*item) for item in lists]
+            streams.append(iterables[0] if len(iterables) == 1
+                           else heapq.merge(*iterables, key=itemgetter(0), reverse=True))
+            ranked_lists.extend(item[2] for item in lists)
+
+        # A token matching one term is scored with one dict lookup.
+        single = [(scorer[0][0].get, scorer[0][1]) for scorer in scorers if len(scorer) == 1]
+        expanded = [[(impacts.get, weight) for impacts, weight in scorer] for scorer in scorers if len(scorer) > 1]
+        depth = max(limit, FACET_DEPTH)
+        top: List[Tuple[float, int]] = []
+        seen = set()
+        frontier = [math.inf] * len(streams)
+        active = list(range(len(streams)))
+        while active:
+            for i in list(active):
+                chunk = list(islice(streams[i], SCAN_CHUNK))
+                if not chunk:
+                    frontier[i] = 0.0
+                    active.remove(i)
+                    continue
+                frontier[i] = chunk[-1][0]
+                for _, key in chunk:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    score = 0.0
+                    for get, weight in single:
+                        score += get(key, 0.0) * weight
+                    for scorer in expanded:
+                        score += max(get(key, 0.0) * weight for get, weight in scorer)
+                    if len(top) < depth:
+                        heapq.heappush(top, (score, -key))
+                    elif score > top[0][0]:
+                        heapq.heapreplace(top, (score, -key))
+            # No document not seen yet can score above the sum of the frontier.
+            if len(top) == depth and top[0][0] >= sum(frontier) or len(seen) >= SCAN_LIMIT:
+                break
+        hits = sorted(top, reverse=True)
+
+        postings = sum(len(ranked) for ranked in ranked_lists)
+        if len(scorers) == 1 and len(scorers[0]) == 1:
+            total, exact = postings, True
+            facet_counts = self._term_facets(only_term, kind)
+        elif not active:
+            total, exact = len(seen), True
+            facet_counts = self._count_facets(seen)
+        elif postings <= EXACT_TOTAL_POSTINGS:
+            matched = set().union(*ranked_lists)
+            total, exact = len(matched), True
+            facet_counts = self._count_facets(matched)
+        else:
+            total, exact = max(len(seen), max(map(len, ranked_lists))), False
+            facet_counts = self._count_facets(-key for _, key in hits)
+
+        docs = self._docs
+        result = {
+            "total": total,
+            "total_exact": exact,
+            "results": [
+                {"type": docs[-key].kind, "id": docs[-key].doc_id, "score": round(score, 4), **docs[-key].summary}
+                for score, key in hits[:limit]
+            ],
+            "facets": {name: dict(counts.most_common()) for name, counts in facet_counts.items() if counts},
+            "facets_exact": exact,
+        }
+        self._results[cache_key] = result
+        while len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
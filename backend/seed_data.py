@@ -1,9 +1,15 @@
+import argparse
 import asyncio
+import random
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument
 import os
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import blog_render
+
 load_dotenv()
 
 # Sample data
@@ -98,24 +104,144 @@ SAMPLE_EXPERIENCES = [
     }
 ]
 
-async def seed_database():
+# Collections whose cached API responses are keyed on a version counter
+# (see ResponseCache in server.py); bumped so running servers drop stale data.
+CACHED_COLLECTIONS = {"projects", "blog_posts", "skills", "experiences"}
+
+BATCH_SIZE = 1000
+
+async def upsert_changed(db, collection, docs):
+    """Write only the documents (keyed on ``id``) that differ from what is stored.
+
+    ``docs`` may be any iterable; it is consumed in batches so synthetic
+    datasets never sit in memory all at once. Returns the number written.
+    """
+    written = 0
+    batch = []
+
+    async def flush():
+        nonlocal written
+        existing = {}
+        async for doc in db[collection].find({"id": {"$in": [d["id"] for d in batch]}}, {"_id": 0}):
+            existing[doc["id"]] = doc
+        ops = [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in batch if existing.get(doc["id"]) != doc]
+        if ops:
+            await db[collection].bulk_write(ops, ordered=False)
+            written += len(ops)
+        batch.clear()
+
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    if written and collection in CACHED_COLLECTIONS:
+        await db.cache_versions.find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    return written
+
+# Synthetic data for load testing. Ids and timestamps are derived from the
+# index, so re-running with the same counts writes nothing.
+WORDS = """
+api async cache cloud component container data database deploy design docker
+edge event fastapi frontend graph hooks index iot javascript kubernetes latency
+linux microservice mobile mongodb network pipeline python query queue raspberry
+react redis render schema search security server signal stream tailwind testing
+typescript ui vector web worker
+""".split()
+TECHNOLOGIES = ["React", "Python", "FastAPI", "Flask", "MongoDB", "Docker", "Redis", "TypeScript", "Raspberry Pi", "Linux"]
+SYNTHETIC_EPOCH = datetime(2024, 1, 1)
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def synthetic_projects(count):
+    rng = random.Random("projects")
+    for i in range(count):
+        yield {
+            "id": f"synthetic-project-{i}",
+            "title": words(rng, 4).title(),
+            "description": words(rng, 40),
+            "technologies": rng.sample(TECHNOLOGIES, 3),
+            "image_url": None,
+            "github_url": f"https://github.com/example/project-{i}",
+            "live_url": None,
+            "featured": i % 10 == 0,
+            "created_at": SYNTHETIC_EPOCH + timedelta(minutes=i),
+        }
+
+def synthetic_posts(count):
+    rng = random.Random("blog_posts")
+    for i in range(count):
+        title = words(rng, 6).title()
+        yield {
+            "id": f"synthetic-post-{i}",
+            "slug": f"{blog_render.slugify(title)}-{i}",
+            "title": title,
+            "content": "\n\n".join(words(rng, 120) for _ in range(5)),
+            "excerpt": words(rng, 20),
+            "image_url": None,
+            "tags": rng.sample(TECHNOLOGIES, 2),
+            "published": i % 5 != 0,
+            "created_at": SYNTHETIC_EPOCH + timedelta(minutes=i),
+        }
+
+def synthetic_contacts(count):
+    rng = random.Random("contacts")
+    for i in range(count):
+        yield {
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Visitor {i}",
+            "email": f"visitor{i}@example.com",
+            "message": words(rng, 60),
+            "subject": "Portfolio Contact",
+            "created_at": SYNTHETIC_EPOCH + timedelta(seconds=i),
+        }
+
+def rendered_posts(posts):
+    """Add the fields the API renders when a post is written (see prepare_blog_post in server.py)."""
+    for post in posts:
+        yield {
+            **post,
+            "slug": post.get("slug") or blog_render.slugify(post["title"]),
+            **blog_render.render_post(post["content"]),
+        }
+
+async def seed_database(projects=0, posts=0, contacts=0):
     client = AsyncIOMotorClient(os.getenv("MONGO_URL"))
     db = client.portfolio_db
-    
-    # Clear existing data
-    await db.projects.delete_many({})
-    await db.blog_posts.delete_many({})
-    await db.skills.delete_many({})
-    await db.experiences.delete_many({})
-    
-    # Insert sample data
-    await db.projects.insert_many(SAMPLE_PROJECTS)
-    await db.blog_posts.insert_many(SAMPLE_BLOG_POSTS)
-    await db.skills.insert_many(SAMPLE_SKILLS)
-    await db.experiences.insert_many(SAMPLE_EXPERIENCES)
-    
+
+    sources = {
+        "projects": SAMPLE_PROJECTS,
+        "blog_posts": SAMPLE_BLOG_POSTS,
+        "skills": SAMPLE_SKILLS,
+        "experiences": SAMPLE_EXPERIENCES,
+    }
+    if projects or posts or contacts:
+        sources = {
+            "projects": synthetic_projects(projects),
+            "blog_posts": synthetic_posts(posts),
+            "contacts": synthetic_contacts(contacts),
+        }
+
+    sources["blog_posts"] = rendered_posts(sources["blog_posts"])
+
+    for collection, docs in sources.items():
+        written = await upsert_changed(db, collection, docs)
+        print(f"{collection}: {written} document(s) written")
+
     print("Database seeded successfully!")
     client.close()
 
 if __name__ == "__main__":
-    asyncio.run(seed_database())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the portfolio database. Only changed documents are written.")
+    parser.add_argument("--projects", type=int, default=0, help="generate N synthetic projects instead of the sample data")
+    parser.add_argument("--posts", type=int, default=0, help="generate N synthetic blog posts")
+    parser.add_argument("--contacts", type=int, default=0, help="generate N synthetic contact messages")
+    args = parser.parse_args()
+    asyncio.run(seed_database(args.projects, args.posts, args.contacts))
@@ -0,0 +1,122 @@
+"""Production entry point: uvicorn with one worker process per core.
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8001]
+    python serve.py --measure-startup [--runs 5]
+
+Each worker imports the app and warms its own Mongo pool and caches
+before it accepts a connection. After that ``/healthz`` answers 200 for
+as long as the process runs, while ``/readyz`` turns 503 when Mongo stops
+answering or shutdown begins. On SIGTERM uvicorn stops accepting
+connections, gives requests in flight GRACEFUL_SHUTDOWN_SECONDS to finish,
+then runs the app's shutdown, which drains background work.
+
+``--measure-startup`` times a single worker from process start until
+``/readyz`` answers, against the MongoDB at MONGO_URL.
+
+This module imports nothing from the app, so the supervisor process
+stays small; only the workers pay for the app's imports.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def available_cores() -> int:
+    # The affinity mask honours taskset/cpuset limits that cpu_count ignores.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+SERVER_SETTINGS = {
+    "HOST": os.getenv("HOST", "0.0.0.0"),
+    "PORT": int(os.getenv("PORT", "8001")),
+    # The app is async, so one worker per core keeps every core busy.
+    "WORKERS": int(os.getenv("WEB_CONCURRENCY", str(available_cores()))),
+    "GRACEFUL_SHUTDOWN_SECONDS": float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "20")),
+    "KEEPALIVE_SECONDS": int(os.getenv("KEEPALIVE_SECONDS", "5")),
+    "BACKLOG": int(os.getenv("LISTEN_BACKLOG", "2048")),
+    # Proxies allowed to set X-Forwarded-For/-Proto; "*" behind a trusted load balancer.
+    "FORWARDED_ALLOW_IPS": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    "LOG_LEVEL": os.getenv("LOG_LEVEL", "info"),
+}
+
+
+def run(workers: int, host: str, port: int):
+    import uvicorn
+    uvicorn.run(
+        "server:app",
+        app_dir=HERE,
+        host=host,
+        port=port,
+        workers=workers,
+        backlog=SERVER_SETTINGS["BACKLOG"],
+        timeout_keep_alive=SERVER_SETTINGS["KEEPALIVE_SECONDS"],
+        timeout_graceful_shutdown=SERVER_SETTINGS["GRACEFUL_SHUTDOWN_SECONDS"],
+        proxy_headers=True,
+        forwarded_allow_ips=SERVER_SETTINGS["FORWARDED_ALLOW_IPS"],
+        log_level=SERVER_SETTINGS["LOG_LEVEL"],
+        access_log=False,
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(timeout: float) -> float:
+    """Start one worker and return the seconds until ``/readyz`` answers 200."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"Worker exited with status {process.returncode} before it was ready")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise SystemExit(f"Worker not ready after {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def measure_startup(runs: int, timeout: float):
+    timings = [time_to_ready(timeout) for _ in range(runs)]
+    print(f"Cold start to ready over {runs} run(s): "
+          f"min {min(timings) * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, "
+          f"max {max(timings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=SERVER_SETTINGS["WORKERS"])
+    parser.add_argument("--host", default=SERVER_SETTINGS["HOST"])
+    parser.add_argument("--port", type=int, default=SERVER_SETTINGS["PORT"])
+    parser.add_argument("--measure-startup", action="store_true", help="time a single worker from launch to ready")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each worker to be ready")
+    args = parser.parse_args()
+    if args.measure_startup:
+        measure_startup(args.runs, args.timeout)
+    else:
+        run(args.workers, args.host, args.port)
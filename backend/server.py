@@ -1,22 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, EmailStr
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, ValidationError
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
 import os
-import smtplib
+import re
+import time
 import uuid
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-import bcrypt
+from datetime import datetime, timedelta, timezone
+
+import analytics
+import blog_render
+import media
+import metrics
+from rate_limit import DuplicateFilter, MongoDuplicateFilter, MongoWindowLimiter, TokenBucket
+from search_index import SearchIndex
+from snapshot import SnapshotBuilder, SnapshotStore
 
 load_dotenv()
 
+logger = logging.getLogger("portfolio")
+
 app = FastAPI(title="Portfolio API", version="1.0.0")
 
 # CORS
@@ -27,14 +51,88 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Database connection
-client = AsyncIOMotorClient(os.getenv("MONGO_URL"))
+MONGO_SETTINGS = {
+    "URL": os.getenv("MONGO_URL"),
+    # Per worker process; the server sees WEB_CONCURRENCY times as many.
+    "MAX_POOL_SIZE": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "MIN_POOL_SIZE": int(os.getenv("MONGO_MIN_POOL_SIZE", "5")),
+    "MAX_IDLE_TIME_MS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "SERVER_SELECTION_TIMEOUT_MS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "CONNECT_TIMEOUT_MS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "SOCKET_TIMEOUT_MS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    # Fail a request instead of queueing it behind a pool that stays exhausted.
+    "WAIT_QUEUE_TIMEOUT_MS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+}
+
+mongo_listener = metrics.MongoCommandListener(slow_ms=float(os.getenv("MONGO_SLOW_MS", "100")))
+# connect=False: no monitor threads or sockets until the first operation,
+# which startup_db makes while warming the pool.
+client = AsyncIOMotorClient(
+    MONGO_SETTINGS["URL"],
+    maxPoolSize=MONGO_SETTINGS["MAX_POOL_SIZE"],
+    minPoolSize=MONGO_SETTINGS["MIN_POOL_SIZE"],
+    maxIdleTimeMS=MONGO_SETTINGS["MAX_IDLE_TIME_MS"],
+    serverSelectionTimeoutMS=MONGO_SETTINGS["SERVER_SELECTION_TIMEOUT_MS"],
+    connectTimeoutMS=MONGO_SETTINGS["CONNECT_TIMEOUT_MS"],
+    socketTimeoutMS=MONGO_SETTINGS["SOCKET_TIMEOUT_MS"],
+    waitQueueTimeoutMS=MONGO_SETTINGS["WAIT_QUEUE_TIMEOUT_MS"],
+    connect=False,
+    event_listeners=[mongo_listener],
+)
 db = client.portfolio_db
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+AUTH_SETTINGS = {
+    "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY"),
+    "JWT_ALGORITHM": "HS256",
+    # bcrypt is CPU bound; keep it off the event loop and off most cores.
+    "HASH_WORKERS": int(os.getenv("AUTH_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    "HASH_MAX_PENDING": int(os.getenv("AUTH_HASH_MAX_PENDING", "16")),
+    "TOKEN_CACHE_SIZE": int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024")),
+}
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/admin/login")
+hash_executor = ThreadPoolExecutor(max_workers=AUTH_SETTINGS["HASH_WORKERS"], thread_name_prefix="bcrypt")
+hash_slots = asyncio.Semaphore(AUTH_SETTINGS["HASH_MAX_PENDING"])
+
+class TokenCache:
+    """Tokens that already passed signature checks, keyed by SHA-256 digest.
+
+    Entries expire at the token's own ``exp``, so a cached token is never
+    accepted for longer than ``jwt.decode`` would have accepted it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        subject, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return subject
+
+    def set(self, token: str, subject: str, expires_at: float):
+        key = self.key(token)
+        self._entries[key] = (subject, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+token_cache = TokenCache(AUTH_SETTINGS["TOKEN_CACHE_SIZE"])
 
 # Models
 class ContactMessage(BaseModel):
@@ -45,12 +143,27 @@ class ContactMessage(BaseModel):
     subject: Optional[str] = "Portfolio Contact"
     created_at: datetime = None
 
+class TrackEvent(BaseModel):
+    type: str
+    id: str
+    event: str = "view"
+
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    format: str
+
 class Project(BaseModel):
     id: str = None
     title: str
     description: str
     technologies: List[str]
     image_url: Optional[str] = None
+    # Set image_id to an uploaded media id; the variants and srcset strings
+    # (one per format) are filled in from the media store on write.
+    image_id: Optional[str] = None
+    image_variants: List[ImageVariant] = []
+    image_srcset: Dict[str, str] = {}
     github_url: Optional[str] = None
     live_url: Optional[str] = None
     featured: bool = False
@@ -58,14 +171,30 @@ class Project(BaseModel):
 
 class BlogPost(BaseModel):
     id: str = None
+    slug: Optional[str] = None
     title: str
     content: str
     excerpt: str
     image_url: Optional[str] = None
+    image_id: Optional[str] = None
+    image_variants: List[ImageVariant] = []
+    image_srcset: Dict[str, str] = {}
     tags: List[str] = []
     published: bool = False
     created_at: datetime = None
 
+class BlogPostSummary(BaseModel):
+    """The fields the blog list returns; the body is only served by the detail endpoints."""
+    id: str
+    slug: Optional[str] = None
+    title: str
+    excerpt: str
+    image_url: Optional[str] = None
+    image_srcset: Dict[str, str] = {}
+    tags: List[str] = []
+    reading_time: Optional[int] = None
+    created_at: datetime
+
 class Skill(BaseModel):
     id: str = None
     name: str
@@ -92,28 +221,709 @@ class Token(BaseModel):
 
 # Email configuration
 GMAIL_SETTINGS = {
-    "SMTP_SERVER": "smtp.gmail.com",
-    "SMTP_PORT": 587,
-    "SMTP_USER": os.getenv("GMAIL_USER"),
+    "SMTP_SERVER": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+    "SMTP_PORT": int(os.getenv("SMTP_PORT", "587")),
+    "SMTP_STARTTLS": os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+    # Set SMTP_USER to an empty string to skip login (e.g. a local test sink).
+    "SMTP_USER": os.getenv("SMTP_USER", os.getenv("GMAIL_USER")),
     "SMTP_PASSWORD": os.getenv("GMAIL_APP_PASSWORD"),
     "FROM_EMAIL": os.getenv("GMAIL_USER")
 }
 
+OUTBOX_SETTINGS = {
+    "BATCH_SIZE": int(os.getenv("OUTBOX_BATCH_SIZE", "20")),
+    "POLL_SECONDS": float(os.getenv("OUTBOX_POLL_SECONDS", "30")),
+    "MAX_ATTEMPTS": int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6")),
+    "BACKOFF_SECONDS": float(os.getenv("OUTBOX_BACKOFF_SECONDS", "30")),
+    "MAX_BACKOFF_SECONDS": float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600")),
+    # A record stuck in "sending" longer than this (worker died mid-send)
+    # is picked up again.
+    "LEASE_SECONDS": float(os.getenv("OUTBOX_LEASE_SECONDS", "300")),
+    "SMTP_IDLE_SECONDS": float(os.getenv("OUTBOX_SMTP_IDLE_SECONDS", "60")),
+}
+
+# Response cache
+CACHE_SETTINGS = {
+    "TTL_SECONDS": float(os.getenv("CACHE_TTL_SECONDS", "300")),
+    "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "256")),
+    # How long a worker trusts its copy of the version counters when no
+    # change stream is available (standalone mongod).
+    "VERSION_POLL_SECONDS": float(os.getenv("CACHE_VERSION_POLL_SECONDS", "1")),
+}
+
+class CachedResponse:
+    __slots__ = ("collection", "version", "body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, collection, version, body, last_modified, expires_at):
+        self.collection = collection
+        self.version = version
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def headers(self):
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+class ResponseCache:
+    """Serialized public list responses with TTL and LRU eviction.
+
+    Every entry records the version of the collection it was built from.
+    Versions live in the ``cache_versions`` collection, so a write on any
+    worker retires the entries held by every other worker.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, poll_interval: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self.watching = False
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._versions = {}
+        self._synced_at = 0.0
+
+    def version(self, collection: str):
+        return self._versions.get(collection, (0, 0.0))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic() or entry.version != self.version(entry.collection)[0]:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, collection: str, version: int, body: bytes) -> CachedResponse:
+        last_modified = self.version(collection)[1] or time.time()
+        entry = CachedResponse(collection, version, body, int(last_modified), time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def apply_version(self, collection: str, version: int, updated_at: Optional[datetime]):
+        # Versions only grow; a stale poll or a late change event must not
+        # roll the collection back or drop entries built from a newer one.
+        if version <= self.version(collection)[0]:
+            return
+        stamp = updated_at.replace(tzinfo=timezone.utc).timestamp() if updated_at else time.time()
+        self._versions[collection] = (version, stamp)
+        for key in [k for k, e in self._entries.items() if e.collection == collection]:
+            del self._entries[key]
+
+    async def sync(self, database, force: bool = False):
+        if not force and (self.watching or time.monotonic() - self._synced_at < self.poll_interval):
+            return
+        async for doc in database.cache_versions.find():
+            self.apply_version(doc["_id"], doc.get("version", 0), doc.get("updated_at"))
+        self._synced_at = time.monotonic()
+
+    async def bump(self, database, collection: str):
+        doc = await database.cache_versions.find_one_and_update(
+            {"_id": collection},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.apply_version(collection, doc["version"], doc["updated_at"])
+        return doc["version"]
+
+    async def watch(self, database):
+        """Apply version bumps from other workers as soon as they happen.
+
+        Change streams need a replica set; on a standalone server this
+        returns and the cache falls back to polling.
+        """
+        try:
+            async with database.cache_versions.watch(full_document="updateLookup") as stream:
+                # Catch up on anything bumped before the stream opened.
+                await self.sync(database, force=True)
+                self.watching = True
+                async for change in stream:
+                    doc = change.get("fullDocument")
+                    if doc:
+                        self.apply_version(doc["_id"], doc.get("version", 0), doc.get("updated_at"))
+        except PyMongoError as e:
+            logger.info("Cache change stream unavailable, polling versions instead: %s", e)
+        finally:
+            self.watching = False
+
+response_cache = ResponseCache(
+    CACHE_SETTINGS["TTL_SECONDS"],
+    CACHE_SETTINGS["MAX_ENTRIES"],
+    CACHE_SETTINGS["VERSION_POLL_SECONDS"],
+)
+
+def is_not_modified(request: Request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags or "W/" + entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= entry.last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def cache_key(path: str, **params) -> str:
+    """The response cache key for ``path`` and the validated parameters its loader reads.
+
+    Anything else in the query string (tracking tags, cache busters) is
+    left out, so it neither misses nor pushes real entries out of the cache.
+    """
+    return path + "?" + urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+
+async def cached_list(request: Request, collection: str, loader, **params):
+    """Serve ``loader()`` through the response cache with conditional GET support.
+
+    ``params`` are the parameters ``loader`` depends on; see ``cache_key``.
+    """
+    await response_cache.sync(db)
+    key = cache_key(request.url.path, **params)
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version(collection)[0]
+        body = JSONResponse(content=jsonable_encoder(await loader())).body
+        entry = response_cache.set(key, collection, version, body)
+    return cached_response(request, entry)
+
+def cached_response(request: Request, entry: CachedResponse) -> Response:
+    if is_not_modified(request, entry):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=entry.headers)
+    return Response(content=entry.body, media_type="application/json", headers=entry.headers)
+
+# Pagination
+PAGE_SETTINGS = {
+    "MAX_LIMIT": int(os.getenv("PAGE_MAX_LIMIT", "100")),
+}
+
+# Newest first; ``id`` breaks ties between documents created in the same instant.
+PAGE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"].isoformat(), doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str], model) -> Optional[dict]:
+    """Turn ``fields=title,excerpt`` into a Mongo projection.
+
+    ``id`` and ``created_at`` are always included because the cursor is
+    built from them.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return dict.fromkeys(requested | {"id", "created_at"}, 1)
+
+def after_query(query: dict, after: Optional[str]) -> dict:
+    """Narrow ``query`` to the documents that sort after cursor ``after``."""
+    if not after:
+        return query
+    created_at, doc_id = decode_cursor(after)
+    return {"$and": [query, {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}},
+    ]}]}
+
+async def find_page(collection, query: dict, limit: Optional[int] = None,
+                    after: Optional[str] = None, projection: Optional[dict] = None):
+    """Keyset pagination over ``created_at``/``id``.
+
+    Without ``limit`` the matching documents are returned as a plain list,
+    as before; with it the result is ``{"items": [...], "next_cursor": ...}``.
+    """
+    cursor = collection.find(after_query(query, after), projection).sort(PAGE_SORT)
+    if limit:
+        cursor = cursor.limit(limit + 1)
+    docs = []
+    async for doc in cursor:
+        doc.setdefault("id", str(doc["_id"]))
+        del doc["_id"]
+        docs.append(doc)
+    if not limit:
+        return docs
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+PageLimit = Query(None, ge=1, le=PAGE_SETTINGS["MAX_LIMIT"])
+
+# Streaming
+EXPORT_SETTINGS = {
+    # Documents per cursor batch, and rows per chunk written to the socket.
+    "BATCH_SIZE": int(os.getenv("EXPORT_BATCH_SIZE", "500")),
+    "CHUNK_ROWS": int(os.getenv("EXPORT_CHUNK_ROWS", "200")),
+}
+
+CONTACT_COLUMNS = ["id", "name", "email", "subject", "message", "created_at"]
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dump_json(doc) -> str:
+    # Same output as JSONResponse, without building the whole payload first.
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+def stream_cursor(collection, query: dict, sort, projection: Optional[dict] = None):
+    projection = dict(projection or {}, _id=0)
+    return collection.find(query, projection).sort(sort).batch_size(EXPORT_SETTINGS["BATCH_SIZE"])
+
+async def iter_json_array(cursor):
+    chunk = ["["]
+    first = True
+    async for doc in cursor:
+        chunk.append(dump_json(doc) if first else "," + dump_json(doc))
+        first = False
+        if len(chunk) >= EXPORT_SETTINGS["CHUNK_ROWS"]:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
+
+async def iter_ndjson(cursor):
+    chunk = []
+    async for doc in cursor:
+        chunk.append(dump_json(doc) + "\n")
+        if len(chunk) >= EXPORT_SETTINGS["CHUNK_ROWS"]:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+# A spreadsheet opening the export evaluates cells starting with these as
+# formulas; contact fields come from the public form.
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_cell(value):
+    if isinstance(value, datetime):
+        return json_default(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def iter_csv(cursor, columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    async for doc in cursor:
+        writer.writerow([csv_cell(value) for value in map(doc.get, columns)])
+        rows += 1
+        if rows % EXPORT_SETTINGS["CHUNK_ROWS"] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Search
+search_index = SearchIndex(
+    fields={
+        "project": {"title": 3.0, "technologies": 2.0, "description": 1.0},
+        "blog": {"title": 3.0, "tags": 2.0, "excerpt": 1.5, "content": 1.0},
+    },
+    facets={"project": ["technologies"], "blog": ["tags"]},
+)
+
+# kind -> (collection, query for searchable documents, summary fields)
+SEARCH_SOURCES = {
+    "project": ("projects", {}, ["title", "description", "technologies", "image_url", "image_srcset"]),
+    "blog": ("blog_posts", {"published": True},
+             ["slug", "title", "excerpt", "tags", "image_url", "image_srcset", "reading_time", "created_at"]),
+}
+
+def search_entry(kind: str, doc: dict):
+    summary = {field: doc.get(field) for field in SEARCH_SOURCES[kind][2]}
+    return doc, summary
+
+async def refresh_search_index():
+    """Rebuild the kinds whose collection moved since they were indexed.
+
+    The documents are read here, the new index is built in a worker thread
+    from them plus the unchanged kinds, and swapped in with one assignment,
+    so queries keep using the old index meanwhile. Requests never call this;
+    they ask ``search_refresher`` to.
+    """
+    global search_index
+    await response_cache.sync(db)
+    replacements = {}
+    for kind, (collection, query, _) in SEARCH_SOURCES.items():
+        version = response_cache.version(collection)[0]
+        if search_index.versions.get(kind) == version:
+            continue
+        projection = dict.fromkeys(["id", *search_index.fields[kind], *SEARCH_SOURCES[kind][2]], 1)
+        projection["_id"] = 0
+        docs = [search_entry(kind, doc) async for doc in db[collection].find(query, projection) if doc.get("id")]
+        replacements[kind] = (docs, version)
+    if not replacements:
+        return
+    # Writes patched into the old index during the build are not carried
+    # over; its version for their kind is then behind, and the next
+    # refresh picks them up.
+    current = search_index
+    carried = current.carry_over(replacements)
+    search_index = await asyncio.to_thread(current.rebuild, carried, replacements)
+
+class SearchRefresher:
+    """Runs ``refresh_search_index`` in the background; calls during a refresh coalesce into one more."""
+
+    def __init__(self):
+        self._task = None
+        self._dirty = False
+
+    def stale(self) -> bool:
+        return any(search_index.versions.get(kind) != response_cache.version(collection)[0]
+                   for kind, (collection, _, _) in SEARCH_SOURCES.items())
+
+    def schedule(self):
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = spawn(self._run())
+
+    async def _run(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await refresh_search_index()
+            except PyMongoError as e:
+                logger.warning("Search index refresh failed: %s", e)
+                return
+            # Writes that landed during the build leave the new index behind.
+            self._dirty = self._dirty or self.stale()
+
+search_refresher = SearchRefresher()
+
+async def content_changed(collection: str, kind: Optional[str] = None,
+                          doc: Optional[dict] = None, removed_id: Optional[str] = None):
+    """Publish an admin write to the response cache and the search index.
+
+    The index is patched in place when it was current before this write;
+    otherwise a background refresh is scheduled to catch it up.
+    """
+    version = await response_cache.bump(db, collection)
+    spawn(portfolio_snapshot.rebuild())
+    if snapshot_builder is not None:
+        snapshot_builder.schedule()
+    if kind is None or search_index.versions.get(kind) != version - 1:
+        search_refresher.schedule()
+        return
+    if doc is not None and all(doc.get(k) == v for k, v in SEARCH_SOURCES[kind][1].items()):
+        search_index.add(kind, *search_entry(kind, doc))
+    else:
+        search_index.remove(kind, removed_id or doc["id"])
+    search_index.versions[kind] = version
+
+# Blog rendering
+BLOG_SETTINGS = {
+    # Sections sent with a post; the rest are fetched from /sections as the reader scrolls.
+    "INITIAL_SECTIONS": int(os.getenv("BLOG_INITIAL_SECTIONS", "3")),
+    "MAX_SECTIONS": int(os.getenv("BLOG_MAX_SECTIONS", "20")),
+    # Stale posts rendered and written back per round trip.
+    "RENDER_BATCH_SIZE": int(os.getenv("BLOG_RENDER_BATCH_SIZE", "200")),
+}
+
+BLOG_SUMMARY_PROJECTION = dict.fromkeys(BlogPostSummary.model_fields, 1)
+BLOG_DETAIL_PROJECTION = {"_id": 0, "content": 0, "content_hash": 0, "render_version": 0}
+
+async def unique_slug(text: str, post_id: str) -> str:
+    """A slug no other post uses as its slug or its id, since /api/blog/{key} takes either."""
+    base = blog_render.slugify(text) or "post"
+    slug, suffix = base, 2
+    while await db.blog_posts.find_one({"$or": [{"slug": slug}, {"id": slug}], "id": {"$ne": post_id}}, {"_id": 1}):
+        slug = f"{base}-{suffix}"
+        suffix += 1
+    return slug
+
+async def prepare_blog_post(post_id: str, doc: dict, existing: Optional[dict] = None):
+    """Add the rendered content fields and a slug to ``doc`` before it is written.
+
+    Rendering is skipped when ``existing`` was rendered from the same source
+    by the same renderer version; an existing slug is kept unless ``doc``
+    asks for a new one. Markdown is never rendered anywhere else.
+    """
+    existing = existing or {}
+    if needs_render({**existing, "content": doc["content"]}):
+        doc.update(await asyncio.to_thread(blog_render.render_post, doc["content"]))
+    if doc.get("slug") or not existing.get("slug"):
+        doc["slug"] = await unique_slug(doc.get("slug") or doc["title"], post_id)
+    else:
+        doc["slug"] = existing["slug"]
+
+def needs_render(post: dict) -> bool:
+    return (post.get("content_hash") != blog_render.content_hash(post["content"])
+            or post.get("render_version") != blog_render.RENDER_VERSION)
+
+def render_posts(contents: List[str]) -> List[dict]:
+    return [blog_render.render_post(content) for content in contents]
+
+async def unique_slugs(titles: Dict[str, str]) -> Dict[str, str]:
+    """``unique_slug`` for several posts without a slug (post id -> title), with one query."""
+    bases = {post_id: blog_render.slugify(title) or "post" for post_id, title in titles.items()}
+    pattern = "^(" + "|".join(map(re.escape, set(bases.values()))) + r")(-\d+)?$"
+    taken = set()
+    async for doc in db.blog_posts.find(
+        {"$or": [{"slug": {"$regex": pattern}}, {"id": {"$regex": pattern}}]}, {"_id": 0, "id": 1, "slug": 1},
+    ):
+        taken.update(value for value in (doc.get("slug"), doc["id"]) if value and re.match(pattern, value))
+    slugs = {}
+    for post_id, base in bases.items():
+        slug, suffix = base, 2
+        while slug in taken and slug != post_id:
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        taken.add(slug)
+        slugs[post_id] = slug
+    return slugs
+
+async def render_stale_posts() -> int:
+    """Render posts stored without going through ``prepare_blog_post``.
+
+    That covers posts written before rendering existed or by an older
+    renderer, and bulk loads whose content changed. Posts are handled
+    RENDER_BATCH_SIZE at a time: one worker thread call renders the batch,
+    one query picks the missing slugs and one bulk write stores the result.
+    """
+    stale = {"$or": [{"render_version": {"$ne": blog_render.RENDER_VERSION}}, {"slug": None}]}
+    projection = {"_id": 0, "id": 1, "title": 1, "content": 1, "slug": 1, "content_hash": 1, "render_version": 1}
+    rendered = 0
+    batch = []
+
+    async def flush():
+        nonlocal rendered
+        changed = [post for post in batch if needs_render(post)]
+        updates = {post["id"]: {} for post in batch}
+        for post, fields in zip(changed, await asyncio.to_thread(render_posts, [post["content"] for post in changed])):
+            updates[post["id"]].update(fields)
+        unnamed = {post["id"]: post["title"] for post in batch if not post.get("slug")}
+        if unnamed:
+            for post_id, slug in (await unique_slugs(unnamed)).items():
+                updates[post_id]["slug"] = slug
+        ops = [UpdateOne({"id": post_id}, {"$set": fields}) for post_id, fields in updates.items() if fields]
+        batch.clear()
+        if not ops:
+            return
+        try:
+            await db.blog_posts.bulk_write(ops, ordered=False)
+            rendered += len(ops)
+        except BulkWriteError as e:
+            # Typically a slug taken meanwhile; those posts stay stale for the next pass.
+            failed = len(e.details.get("writeErrors", []))
+            rendered += len(ops) - failed
+            logger.warning("Could not store %d rendered blog post(s): %s", failed, e)
+
+    async for post in db.blog_posts.find(stale, projection):
+        post["content"] = post.get("content") or ""
+        batch.append(post)
+        if len(batch) >= BLOG_SETTINGS["RENDER_BATCH_SIZE"]:
+            await flush()
+    if batch:
+        await flush()
+    if rendered:
+        logger.info("Rendered %d blog post(s)", rendered)
+    return rendered
+
+# Home page bootstrap
+async def load_projects():
+    return await find_page(db.projects, {})
+
+async def load_blog_posts():
+    return await find_page(db.blog_posts, {"published": True}, projection=BLOG_SUMMARY_PROJECTION)
+
+async def load_skills():
+    skills = []
+    async for skill in db.skills.find():
+        skill.setdefault("id", str(skill["_id"]))
+        del skill["_id"]
+        skills.append(skill)
+    return skills
+
+async def load_experience():
+    experiences = []
+    async for exp in db.experiences.find():
+        exp.setdefault("id", str(exp["_id"]))
+        del exp["_id"]
+        experiences.append(exp)
+    return experiences
+
+# section -> (collection, loader), in response order
+PORTFOLIO_SECTIONS = {
+    "projects": ("projects", load_projects),
+    "blog": ("blog_posts", load_blog_posts),
+    "skills": ("skills", load_skills),
+    "experience": ("experiences", load_experience),
+}
+
+class PortfolioSnapshot:
+    """Pre-serialized sections for ``/api/portfolio``.
+
+    A section is re-read only when its collection's version moves (or its
+    TTL lapses, for writes that bypass the API); the others are reused as
+    bytes and spliced into the response.
+    """
+
+    def __init__(self, sections: dict, ttl: float):
+        self.sections = sections
+        self.ttl = ttl
+        self._built = {}
+        self._responses = {}
+        self._lock = asyncio.Lock()
+
+    def _current(self, names) -> tuple:
+        return tuple(response_cache.version(self.sections[name][0])[0] for name in names)
+
+    def _fresh(self, name: str) -> bool:
+        built = self._built.get(name)
+        return (built is not None and built[2] > time.monotonic()
+                and built[0] == response_cache.version(self.sections[name][0])[0])
+
+    async def get(self, names: tuple) -> CachedResponse:
+        await response_cache.sync(db)
+        entry = self._responses.get(names)
+        if entry is not None and entry.version == self._current(names) and all(map(self._fresh, names)):
+            return entry
+        async with self._lock:
+            stale = [name for name in names if not self._fresh(name)]
+            if stale:
+                versions = dict(zip(stale, self._current(stale)))
+                results = await asyncio.gather(*(self.sections[name][1]() for name in stale))
+                for name, data in zip(stale, results):
+                    body = JSONResponse(content=jsonable_encoder(data)).body
+                    self._built[name] = (versions[name], body, time.monotonic() + self.ttl)
+            body = b"{" + b",".join(b'"%s":%s' % (name.encode(), self._built[name][1]) for name in names) + b"}"
+            last_modified = max(response_cache.version(self.sections[name][0])[1] for name in names) or time.time()
+            entry = CachedResponse("portfolio", tuple(self._built[name][0] for name in names),
+                                   body, int(last_modified), float("inf"))
+            self._responses[names] = entry
+            return entry
+
+    async def rebuild(self):
+        try:
+            await self.get(tuple(self.sections))
+        except PyMongoError as e:
+            logger.warning("Could not rebuild portfolio snapshot: %s", e)
+
+    def warm(self, cache: "ResponseCache") -> int:
+        """Seed ``cache`` for the unfiltered list endpoints from sections built here.
+
+        ``/api/<section>`` with no query string serves the same loader as the
+        section, so the bytes are reused instead of loaded a second time.
+        """
+        warmed = 0
+        for name, (collection, _) in self.sections.items():
+            built = self._built.get(name)
+            if built is not None and built[0] == cache.version(collection)[0]:
+                cache.set(cache_key(f"/api/{name}"), collection, built[0], built[1])
+                warmed += 1
+        return warmed
+
+portfolio_snapshot = PortfolioSnapshot(PORTFOLIO_SECTIONS, CACHE_SETTINGS["TTL_SECONDS"])
+
+# Static snapshots
+SNAPSHOT_SETTINGS = {
+    # Directory nginx or a CDN serves the snapshots from; unset disables them.
+    "DIR": os.getenv("SNAPSHOT_DIR", ""),
+    # Unreferenced files are kept this long for readers of an older manifest.
+    "KEEP_SECONDS": float(os.getenv("SNAPSHOT_KEEP_SECONDS", "600")),
+}
+
+def snapshot_of(path: str, loader):
+    async def build():
+        yield path, JSONResponse(content=jsonable_encoder(await loader())).body
+    return build
+
+async def snapshot_portfolio():
+    yield "/api/portfolio", (await portfolio_snapshot.get(tuple(PORTFOLIO_SECTIONS))).body
+
+async def snapshot_blog_posts():
+    """Every published post with all of its sections, by id and by slug."""
+    async for post in db.blog_posts.find({"published": True}, BLOG_DETAIL_PROJECTION):
+        body = JSONResponse(content=jsonable_encoder(post)).body
+        yield f"/api/blog/{post['id']}", body
+        if post.get("slug"):
+            yield f"/api/blog/{post['slug']}", body
+
+async def snapshot_versions() -> Dict[str, int]:
+    await response_cache.sync(db, force=True)
+    return {collection: response_cache.version(collection)[0] for collection, _ in PORTFOLIO_SECTIONS.values()}
+
+# group -> (source collections, snapshot generator); the list endpoints
+# share their paths with the portfolio sections.
+SNAPSHOT_GROUPS = {
+    **{name: ([collection], snapshot_of(f"/api/{name}", loader))
+       for name, (collection, loader) in PORTFOLIO_SECTIONS.items()},
+    "portfolio": ([collection for collection, _ in PORTFOLIO_SECTIONS.values()], snapshot_portfolio),
+    "blog_posts": (["blog_posts"], snapshot_blog_posts),
+}
+
+snapshot_builder = (
+    SnapshotBuilder(SnapshotStore(SNAPSHOT_SETTINGS["DIR"], SNAPSHOT_SETTINGS["KEEP_SECONDS"]),
+                    SNAPSHOT_GROUPS, snapshot_versions)
+    if SNAPSHOT_SETTINGS["DIR"] else None
+)
+
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+background_tasks = set()
+
+def spawn(coro):
+    """Start a fire-and-forget task, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def run_hash(func, *args):
+    """Run a bcrypt call on the hashing pool, holding at most HASH_MAX_PENDING slots."""
+    with metrics.bcrypt_duration.time(func.__name__):
+        async with hash_slots:
+            return await asyncio.get_running_loop().run_in_executor(hash_executor, func, *args)
+
+_pwd_context = None
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def password_context():
+    # passlib and its bcrypt backend are only needed by admin logins, so
+    # they are imported on first use rather than on every worker start.
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+async def verify_password(plain_password, hashed_password):
+    return await run_hash(password_context().verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await run_hash(password_context().hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, os.getenv("JWT_SECRET_KEY"), algorithm="HS256")
+    encoded_jwt = jwt.encode(to_encode, AUTH_SETTINGS["JWT_SECRET_KEY"], algorithm=AUTH_SETTINGS["JWT_ALGORITHM"])
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -122,123 +932,741 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    from jose import JWTError, jwt
     try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET_KEY"), algorithms=["HS256"])
+        payload = jwt.decode(token, AUTH_SETTINGS["JWT_SECRET_KEY"], algorithms=[AUTH_SETTINGS["JWT_ALGORITHM"]])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    if payload.get("exp") is not None:
+        token_cache.set(token, email, float(payload["exp"]))
     return email
 
-async def send_email(to_email: str, subject: str, message: str):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = GMAIL_SETTINGS["FROM_EMAIL"]
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(message, 'html'))
-        
-        server = smtplib.SMTP(GMAIL_SETTINGS["SMTP_SERVER"], GMAIL_SETTINGS["SMTP_PORT"])
-        server.starttls()
-        server.login(GMAIL_SETTINGS["SMTP_USER"], GMAIL_SETTINGS["SMTP_PASSWORD"])
-        server.send_message(msg)
-        server.quit()
+def build_email(to_email: str, subject: str, message: str):
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    msg = MIMEMultipart()
+    msg['From'] = GMAIL_SETTINGS["FROM_EMAIL"]
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(message, 'html'))
+    return msg
+
+class MailUnavailable(Exception):
+    """The SMTP server could not be reached, so no message can be sent for now."""
+
+class MailSender:
+    """One SMTP session reused across sends, reopened when it drops or idles out.
+
+    smtplib blocks, so callers run ``send`` in a worker thread. It is
+    imported on first use; only the outbox worker ever needs it. Failures
+    to reach the server raise MailUnavailable; a message the server
+    rejects raises the smtplib error.
+    """
+
+    def __init__(self, settings: dict, idle_seconds: float):
+        self.settings = settings
+        self.idle_seconds = idle_seconds
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        import smtplib
+        try:
+            return self._open()
+        except (smtplib.SMTPException, OSError) as e:
+            raise MailUnavailable(f"Cannot reach {self.settings['SMTP_SERVER']}: {e}") from e
+
+    def _open(self):
+        import smtplib
+        server = smtplib.SMTP(self.settings["SMTP_SERVER"], self.settings["SMTP_PORT"], timeout=30)
+        if self.settings["SMTP_STARTTLS"]:
+            server.starttls()
+        if self.settings["SMTP_USER"]:
+            server.login(self.settings["SMTP_USER"], self.settings["SMTP_PASSWORD"])
+        return server
+
+    def send(self, msg):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            self._send(msg)
+            outcome = "sent"
+        finally:
+            metrics.email_duration.observe(time.perf_counter() - started, outcome)
+
+    def _send(self, msg):
+        import smtplib
+        self.close_if_idle()
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server hung up between batches; retry once on a fresh session.
+            self._server = self._connect()
+            self._server.send_message(msg)
+        except smtplib.SMTPException:
+            self.close()
+            raise
+        except OSError as e:
+            # A timeout or reset mid-session: the server, not the message.
+            self.close()
+            raise MailUnavailable(str(e)) from e
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            import smtplib
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+mail_sender = MailSender(GMAIL_SETTINGS, OUTBOX_SETTINGS["SMTP_IDLE_SECONDS"])
+
+def outbox_record(to_email: str, subject: str, message: str, contact_id: Optional[str] = None) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "contact_id": contact_id,
+        "to_email": to_email,
+        "subject": subject,
+        "message": message,
+        "status": "pending",
+        "attempts": 0,
+        "last_error": None,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+
+def contact_notification(contact: dict) -> dict:
+    """The outbox record that tells the site owner about a contact message."""
+    email_body = f"""
+        <h2>New Contact Form Submission</h2>
+        <p><strong>Name:</strong> {contact['name']}</p>
+        <p><strong>Email:</strong> {contact['email']}</p>
+        <p><strong>Subject:</strong> {contact['subject']}</p>
+        <p><strong>Message:</strong></p>
+        <p>{contact['message']}</p>
+        """
+    return outbox_record(
+        to_email=os.getenv("GMAIL_USER"),
+        subject=f"Portfolio Contact: {contact['subject']}",
+        message=email_body,
+        contact_id=contact["id"],
+    )
+
+async def queue_contact_notification(database, contact: dict):
+    """Queue the notification for a stored contact, then mark the contact queued.
+
+    Keyed on ``contact_id``, so queueing the same contact twice (a retry
+    after the flag update failed) still sends a single email.
+    """
+    notification = contact_notification(contact)
+    await database.email_outbox.update_one(
+        {"contact_id": contact["id"]}, {"$setOnInsert": notification}, upsert=True)
+    await database.contacts.update_one({"id": contact["id"]}, {"$set": {"notification_queued": True}})
+
+async def queue_missed_notifications(database) -> int:
+    """Queue notifications for contacts stored without one (the outbox write failed)."""
+    queued = 0
+    async for contact in database.contacts.find({"notification_queued": False}, {"_id": 0}):
+        await queue_contact_notification(database, contact)
+        queued += 1
+    return queued
+
+class OutboxWorker:
+    """Drains ``email_outbox`` in the background.
+
+    Records are claimed atomically, so several app workers can run this
+    side by side without sending a message twice. Each pass first queues
+    any contact notification whose outbox write failed in the request.
+    """
+
+    def __init__(self, sender: MailSender, settings: dict):
+        self.sender = sender
+        self.settings = settings
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+
+    def notify(self):
+        self.wakeup.set()
+
+    def stop(self):
+        """Finish the batch in hand, claim no more, and return from ``run``.
+
+        Cancelling mid-send instead would leave claimed records leased
+        until LEASE_SECONDS pass, and possibly sent twice after that.
+        """
+        self.stopping = True
+        self.wakeup.set()
+
+    async def claim(self, database) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await database.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "sending", "lease_until": now + timedelta(seconds=self.settings["LEASE_SECONDS"])}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def deliver(self, database, record: dict):
+        msg = build_email(record["to_email"], record["subject"], record["message"])
+        try:
+            await asyncio.to_thread(self.sender.send, msg)
+        except Exception as e:
+            attempts = record["attempts"] + 1
+            dead = attempts >= self.settings["MAX_ATTEMPTS"]
+            delay = min(self.settings["BACKOFF_SECONDS"] * 2 ** (attempts - 1), self.settings["MAX_BACKOFF_SECONDS"])
+            logger.warning("Email %s failed (attempt %d): %s", record["id"], attempts, e)
+            await database.email_outbox.update_one({"_id": record["_id"]}, {"$set": {
+                "status": "dead" if dead else "pending",
+                "attempts": attempts,
+                "last_error": str(e),
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+            }, "$unset": {"lease_until": ""}})
+            if isinstance(e, MailUnavailable):
+                raise
+            return False
+        await database.email_outbox.update_one({"_id": record["_id"]}, {"$set": {
+            "status": "sent",
+            "attempts": record["attempts"] + 1,
+            "sent_at": datetime.utcnow(),
+        }, "$unset": {"lease_until": ""}})
         return True
-    except Exception as e:
-        print(f"Email error: {e}")
-        return False
+
+    async def release(self, database, records: List[dict]):
+        """Return claimed records to ``pending`` unsent, without counting an attempt."""
+        if records:
+            await database.email_outbox.update_many(
+                {"_id": {"$in": [record["_id"] for record in records]}, "status": "sending"},
+                {"$set": {"status": "pending"}, "$unset": {"lease_until": ""}})
+
+    async def drain(self, database) -> int:
+        """Send everything that is due, a batch per SMTP session. Returns the number sent."""
+        sent = 0
+        while not self.stopping:
+            batch = []
+            while len(batch) < self.settings["BATCH_SIZE"]:
+                record = await self.claim(database)
+                if record is None:
+                    break
+                batch.append(record)
+            if not batch:
+                return sent
+            for position, record in enumerate(batch):
+                try:
+                    sent += await self.deliver(database, record)
+                except MailUnavailable:
+                    # Each of the others would wait out the same connect
+                    # timeout while its lease runs down; hand them back.
+                    await self.release(database, batch[position + 1:])
+                    return sent
+            if len(batch) < self.settings["BATCH_SIZE"]:
+                return sent
+        return sent
+
+    async def run(self, database):
+        self.stopping = False
+        while not self.stopping:
+            # Cleared before draining so a submission that lands mid-drain
+            # triggers another pass instead of waiting for the poll.
+            self.wakeup.clear()
+            try:
+                await queue_missed_notifications(database)
+                await self.drain(database)
+            except PyMongoError as e:
+                logger.warning("Email outbox unavailable: %s", e)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.settings["POLL_SECONDS"])
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self.sender.close_if_idle)
+
+outbox_worker = OutboxWorker(mail_sender, OUTBOX_SETTINGS)
+
+# Admission control
+def limit_settings(prefix: str, per_minute: str, burst: str, global_per_minute: str, max_in_flight: str) -> dict:
+    return {
+        "PER_MINUTE": float(os.getenv(f"{prefix}_RATE_PER_MINUTE", per_minute)),
+        "BURST": float(os.getenv(f"{prefix}_BURST", burst)),
+        "GLOBAL_PER_MINUTE": float(os.getenv(f"{prefix}_GLOBAL_RATE_PER_MINUTE", global_per_minute)),
+        # Requests past this many in progress are shed rather than queued.
+        "MAX_IN_FLIGHT": int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", max_in_flight)),
+    }
+
+RATE_LIMIT_SETTINGS = {
+    "ENABLED": os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+    # Count per-client requests in Mongo so the limit holds across workers.
+    # The global limit and the in-flight cap stay per worker.
+    "SHARED": os.getenv("RATE_LIMIT_SHARED", "false").lower() == "true",
+    "MAX_CLIENTS": int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000")),
+    "CONTACT": limit_settings("CONTACT", "3", "5", "120", "32"),
+    "LOGIN": limit_settings("LOGIN", "5", "5", "60", "8"),
+    "TRACK": limit_settings("TRACK", "120", "60", "60000", "1024"),
+    # Identical contact submissions within this many seconds are dropped.
+    "CONTACT_DEDUP_SECONDS": float(os.getenv("CONTACT_DEDUP_SECONDS", "600")),
+}
+
+def client_address(request: Request) -> str:
+    # Behind a proxy, uvicorn's proxy_headers (see serve.py) has already put
+    # the address its trusted hop saw here. X-Forwarded-For itself is never
+    # read: the client writes its leftmost entries.
+    return request.client.host if request.client else "-"
+
+class AdmissionControl:
+    """Endpoint dependency that rejects with 429 and Retry-After.
+
+    Checks, cheapest first: the client's token bucket, the endpoint-wide
+    bucket, the number of requests already in progress, and finally the
+    shared Mongo window when RATE_LIMIT_SHARED is set.
+    """
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.per_client = TokenBucket(settings["PER_MINUTE"] / 60, settings["BURST"],
+                                      max_keys=RATE_LIMIT_SETTINGS["MAX_CLIENTS"])
+        self.overall = TokenBucket(settings["GLOBAL_PER_MINUTE"] / 60, settings["GLOBAL_PER_MINUTE"] / 4)
+        self.shared = MongoWindowLimiter(db.rate_limits, int(settings["PER_MINUTE"] + settings["BURST"]), 60)
+        self.max_in_flight = settings["MAX_IN_FLIGHT"]
+        self.in_flight = 0
+
+    def reject(self, reason: str, retry_after: float):
+        metrics.admission_rejections.inc(self.name, reason)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_SETTINGS["ENABLED"]:
+            yield
+            return
+        address = client_address(request)
+        wait = self.per_client.take(address)
+        if wait:
+            self.reject("client", wait)
+        wait = self.overall.take(self.name)
+        if wait:
+            self.reject("global", wait)
+        if self.in_flight >= self.max_in_flight:
+            self.reject("overload", 1)
+        self.in_flight += 1
+        try:
+            if RATE_LIMIT_SETTINGS["SHARED"]:
+                wait = await self.shared.take(f"{self.name}:{address}")
+                if wait:
+                    self.reject("client", wait)
+            yield
+        finally:
+            self.in_flight -= 1
+
+contact_admission = AdmissionControl("contact", RATE_LIMIT_SETTINGS["CONTACT"])
+login_admission = AdmissionControl("login", RATE_LIMIT_SETTINGS["LOGIN"])
+track_admission = AdmissionControl("track", RATE_LIMIT_SETTINGS["TRACK"])
+contact_duplicates = DuplicateFilter(RATE_LIMIT_SETTINGS["CONTACT_DEDUP_SECONDS"])
+shared_contact_duplicates = MongoDuplicateFilter(db.contact_digests, RATE_LIMIT_SETTINGS["CONTACT_DEDUP_SECONDS"])
+
+def contact_digest(contact: ContactMessage) -> str:
+    content = "\0".join([contact.email.lower(), (contact.subject or "").strip(), contact.message.strip()])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+async def is_duplicate_contact(digest: str) -> bool:
+    if contact_duplicates.seen(digest):
+        return True
+    return RATE_LIMIT_SETTINGS["SHARED"] and await shared_contact_duplicates.seen(digest)
+
+async def forget_contact(digest: str):
+    """Let a submission that failed to store be sent again."""
+    contact_duplicates.forget(digest)
+    if RATE_LIMIT_SETTINGS["SHARED"]:
+        await shared_contact_duplicates.forget(digest)
+
+# Analytics
+ANALYTICS_SETTINGS = {
+    "FLUSH_SECONDS": float(os.getenv("ANALYTICS_FLUSH_SECONDS", "10")),
+    "POPULARITY_DAYS": int(os.getenv("ANALYTICS_POPULARITY_DAYS", "30")),
+    "POPULARITY_REFRESH_SECONDS": float(os.getenv("ANALYTICS_POPULARITY_REFRESH_SECONDS", "300")),
+    # Distinct (day, type, id, event) keys buffered between flushes.
+    "MAX_KEYS": int(os.getenv("ANALYTICS_MAX_KEYS", "50000")),
+}
+
+tracker = analytics.Analytics(ANALYTICS_SETTINGS["MAX_KEYS"], ANALYTICS_SETTINGS["POPULARITY_DAYS"])
 
 # Database initialization
-@app.on_event("startup")
-async def startup_db():
-    # Create admin user if not exists
+INDEXES = {
+    "projects": [
+        ([("id", ASCENDING)], {"unique": True}),
+        (PAGE_SORT, {}),
+        ([("featured", ASCENDING)] + PAGE_SORT, {}),
+        ([("technologies", ASCENDING)], {}),
+    ],
+    "blog_posts": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("slug", ASCENDING)], {"unique": True, "partialFilterExpression": {"slug": {"$type": "string"}}}),
+        ([("published", ASCENDING)] + PAGE_SORT, {}),
+        ([("tags", ASCENDING)], {}),
+    ],
+    "contacts": [
+        ([("id", ASCENDING)], {"unique": True}),
+        (PAGE_SORT, {}),
+        ([("notification_queued", ASCENDING)], {"partialFilterExpression": {"notification_queued": False}}),
+    ],
+    "skills": [
+        ([("id", ASCENDING)], {"unique": True}),
+    ],
+    "experiences": [
+        ([("id", ASCENDING)], {"unique": True}),
+    ],
+    "admin_users": [
+        ([("email", ASCENDING)], {"unique": True}),
+    ],
+    "media": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("sha256", ASCENDING)], {}),
+    ],
+    "email_outbox": [
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+        ([("contact_id", ASCENDING)], {"unique": True, "partialFilterExpression": {"contact_id": {"$type": "string"}}}),
+    ],
+    "analytics_daily": [
+        ([("day", ASCENDING), ("kind", ASCENDING)], {}),
+        ([("target_id", ASCENDING), ("day", ASCENDING)], {}),
+    ],
+    "rate_limits": [
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "contact_digests": [
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+async def ensure_indexes():
+    # create_index is a no-op when an identical index already exists.
+    async def create(collection, keys, options):
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            logger.warning("Could not create index %s on %s: %s", keys, collection, e)
+    await asyncio.gather(*(create(collection, keys, options)
+                           for collection, indexes in INDEXES.items() for keys, options in indexes))
+
+# Lifecycle
+LIFECYCLE_SETTINGS = {
+    # Connections opened before the worker reports ready.
+    "WARM_CONNECTIONS": int(os.getenv("MONGO_WARM_CONNECTIONS", str(max(1, MONGO_SETTINGS["MIN_POOL_SIZE"])))),
+    # /readyz fails when Mongo takes longer than this to answer a ping.
+    "READY_PING_TIMEOUT_SECONDS": float(os.getenv("READY_PING_TIMEOUT_SECONDS", "1")),
+    # Background work gets this long to finish at shutdown before it is cancelled.
+    "DRAIN_SECONDS": float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "10")),
+}
+
+# "starting" until startup_db finishes, "ready", then "draining" from shutdown on.
+app.state.lifecycle = "starting"
+
+async def warm_pool():
+    """Open WARM_CONNECTIONS pool connections now instead of on the first requests.
+
+    Concurrent pings each check out a connection, so the pool grows to
+    that size; this is also where an unreachable server fails startup.
+    """
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(LIFECYCLE_SETTINGS["WARM_CONNECTIONS"])))
+
+async def ensure_admin():
     admin_exists = await db.admin_users.find_one({"email": os.getenv("ADMIN_EMAIL")})
     if not admin_exists:
-        hashed_password = get_password_hash(os.getenv("ADMIN_PASSWORD"))
-        await db.admin_users.insert_one({
-            "email": os.getenv("ADMIN_EMAIL"),
-            "password": hashed_password,
-            "created_at": datetime.utcnow()
-        })
+        hashed_password = await get_password_hash(os.getenv("ADMIN_PASSWORD"))
+        # Every worker runs this at startup; only the first to get here inserts.
+        await db.admin_users.update_one(
+            {"email": os.getenv("ADMIN_EMAIL")},
+            {"$setOnInsert": {"password": hashed_password, "created_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+async def render_and_bump():
+    if await render_stale_posts():
+        await response_cache.bump(db, "blog_posts")
+
+async def drain(tasks, timeout: float) -> int:
+    """Wait up to ``timeout`` seconds for ``tasks``, then cancel the rest. Returns how many were cancelled."""
+    tasks = [task for task in tasks if task is not None]
+    if not tasks:
+        return 0
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return len(pending)
+
+@app.on_event("startup")
+async def startup_db():
+    started = time.perf_counter()
+    await warm_pool()
+    # The admin upsert waits for the unique email index, so workers starting
+    # together on a fresh database cannot insert the admin twice. The caches
+    # below read what these write.
+    async def indexes_then_admin():
+        await ensure_indexes()
+        await ensure_admin()
+    await asyncio.gather(indexes_then_admin(), render_and_bump())
+    await asyncio.gather(refresh_search_index(), portfolio_snapshot.rebuild(), tracker.refresh_popularity(db))
+    portfolio_snapshot.warm(response_cache)
+    if snapshot_builder is not None:
+        snapshot_builder.schedule()
+    app.state.cache_watcher = asyncio.create_task(response_cache.watch(db))
+    app.state.outbox_worker = asyncio.create_task(outbox_worker.run(db))
+    app.state.analytics_flusher = asyncio.create_task(tracker.run(
+        db, ANALYTICS_SETTINGS["FLUSH_SECONDS"], ANALYTICS_SETTINGS["POPULARITY_REFRESH_SECONDS"]))
+    app.state.lifecycle = "ready"
+    logger.info("Worker %d ready in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1000)
+
+@app.on_event("shutdown")
+async def shutdown_db():
+    # uvicorn has stopped accepting connections and finished (or timed out)
+    # the requests in flight; what is left is work they started.
+    app.state.lifecycle = "draining"
+    # A worker whose startup failed partway has not created every task.
+    cache_watcher = getattr(app.state, "cache_watcher", None)
+    outbox_task = getattr(app.state, "outbox_worker", None)
+    analytics_flusher = getattr(app.state, "analytics_flusher", None)
+    for task in (cache_watcher, analytics_flusher):
+        if task is not None:
+            task.cancel()
+    outbox_worker.stop()
+    cancelled = await drain([*background_tasks, outbox_task, cache_watcher, analytics_flusher],
+                            LIFECYCLE_SETTINGS["DRAIN_SECONDS"])
+    if cancelled:
+        logger.warning("Cancelled %d background task(s) still running after %.0fs",
+                       cancelled, LIFECYCLE_SETTINGS["DRAIN_SECONDS"])
+    try:
+        await tracker.flush(db)
+    except PyMongoError as e:
+        logger.error("Dropping %d unflushed analytics event(s): %s", tracker.pending(), e)
+    if snapshot_builder is not None:
+        await snapshot_builder.wait()
+    await asyncio.to_thread(mail_sender.close)
+    client.close()
+    metrics.profiler.dump()
 
 # Public endpoints
 @app.get("/")
 async def root():
     return {"message": "Portfolio API is running"}
 
-@app.post("/api/contact")
-async def submit_contact(contact: ContactMessage):
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is serving requests. Deliberately ignores Mongo,
+    so a database outage does not get every worker restarted."""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: started, not shutting down, and Mongo answers a ping."""
+    if app.state.lifecycle != "ready":
+        return JSONResponse(status_code=503, content={"status": app.state.lifecycle})
     try:
-        # Generate ID and timestamp
-        contact.id = str(uuid.uuid4())
-        contact.created_at = datetime.utcnow()
-        
-        # Save to database
-        await db.contacts.insert_one(contact.dict())
-        
-        # Send email notification
-        email_body = f"""
-        <h2>New Contact Form Submission</h2>
-        <p><strong>Name:</strong> {contact.name}</p>
-        <p><strong>Email:</strong> {contact.email}</p>
-        <p><strong>Subject:</strong> {contact.subject}</p>
-        <p><strong>Message:</strong></p>
-        <p>{contact.message}</p>
-        """
-        
-        await send_email(
-            to_email=os.getenv("GMAIL_USER"),
-            subject=f"Portfolio Contact: {contact.subject}",
-            message=email_body
-        )
-        
+        await asyncio.wait_for(client.admin.command("ping"), LIFECYCLE_SETTINGS["READY_PING_TIMEOUT_SECONDS"])
+    except (PyMongoError, asyncio.TimeoutError):
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/contact", dependencies=[Depends(contact_admission)])
+async def submit_contact(contact: ContactMessage):
+    digest = contact_digest(contact)
+    if await is_duplicate_contact(digest):
+        # Already accepted; answer the same way so a resubmit looks normal.
         return {"message": "Contact message sent successfully"}
+    contact.id = str(uuid.uuid4())
+    contact.created_at = datetime.utcnow()
+    # The contact records whether its notification is queued, so one whose
+    # outbox write fails here is queued later by the outbox worker.
+    stored = {**contact.dict(), "notification_queued": False}
+    try:
+        await db.contacts.insert_one(stored)
     except Exception as e:
+        await forget_contact(digest)
         raise HTTPException(status_code=500, detail=str(e))
+    # Stored: from here on a resubmit is a duplicate, whatever happens to the email.
+    try:
+        await queue_contact_notification(db, stored)
+    except PyMongoError as e:
+        logger.warning("Contact %s stored; notification left for the outbox worker: %s", contact.id, e)
+    outbox_worker.notify()
+    return {"message": "Contact message sent successfully"}
+
+@app.post("/api/track", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(track_admission)])
+async def track(request: Request):
+    """Count a view or link click; written to the daily rollups on the next flush.
+
+    The JSON body is read whatever the content type, so the frontend can
+    use ``navigator.sendBeacon`` without a CORS preflight.
+    """
+    try:
+        event = TrackEvent.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=describe_error(e))
+    if event.event not in analytics.EVENTS.get(event.type, ()):
+        raise HTTPException(status_code=400, detail=f"Cannot track {event.event!r} for {event.type!r}")
+    # The search index holds every project and published post. It is checked
+    # as it stands: an id written on another worker moments ago may 404
+    # until the background refresh catches up, which costs a view at most.
+    if (event.type, event.id) not in search_index:
+        if search_refresher.stale():
+            search_refresher.schedule()
+        raise HTTPException(status_code=404, detail=f"Unknown {event.type}: {event.id}")
+    outcome = "buffered" if tracker.add(event.type, event.id, event.event) else "dropped"
+    metrics.analytics_events.inc(event.type, event.event, outcome)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @app.get("/api/projects")
-async def get_projects():
-    projects = []
-    async for project in db.projects.find():
-        project["id"] = str(project["_id"])
-        del project["_id"]
-        projects.append(project)
-    return projects
+async def get_projects(
+    request: Request,
+    limit: Optional[int] = PageLimit,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    featured: Optional[bool] = None,
+    technology: Optional[str] = None,
+    sort: str = Query("newest", pattern="^(newest|popular)$"),
+):
+    query = {}
+    if featured is not None:
+        query["featured"] = featured
+    if technology:
+        query["technologies"] = technology
+    projection = parse_fields(fields, Project)
+    params = {"limit": limit, "after": after, "fields": projection and ",".join(sorted(projection)),
+              "featured": featured, "technology": technology}
+
+    if sort == "popular":
+        if after:
+            raise HTTPException(status_code=400, detail="Cursors are not supported with sort=popular")
+
+        # Ranked from the rollups, which are re-read every
+        # ANALYTICS_POPULARITY_REFRESH_SECONDS; the cached response may lag
+        # by up to CACHE_TTL_SECONDS more.
+        async def load():
+            docs = await find_page(db.projects, query, projection=projection)
+            docs.sort(key=lambda doc: tracker.score("project", doc["id"]), reverse=True)
+            return {"items": docs[:limit], "next_cursor": None} if limit else docs
+        return await cached_list(request, "projects", load, sort=sort, **params)
+
+    async def load():
+        return await find_page(db.projects, query, limit, after, projection)
+    return await cached_list(request, "projects", load, **params)
 
 @app.get("/api/blog")
-async def get_blog_posts():
-    posts = []
-    async for post in db.blog_posts.find({"published": True}):
-        post["id"] = str(post["_id"])
-        del post["_id"]
-        posts.append(post)
-    return posts
+async def get_blog_posts(
+    request: Request,
+    limit: Optional[int] = PageLimit,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    query = {"published": True}
+    if tag:
+        query["tags"] = tag
+    requested = parse_fields(fields, BlogPostSummary)
+    projection = requested or BLOG_SUMMARY_PROJECTION
+
+    async def load():
+        return await find_page(db.blog_posts, query, limit, after, projection)
+    return await cached_list(request, "blog_posts", load, limit=limit, after=after, tag=tag,
+                             fields=requested and ",".join(sorted(requested)))
+
+async def find_published_post(key: str, projection: dict) -> Optional[dict]:
+    """A published post by id or, failing that, by slug.
+
+    Slugs steer clear of ids (see unique_slug), but a bulk load can still
+    bring in an id that another post already uses as its slug; the id wins.
+    """
+    post = await db.blog_posts.find_one({"published": True, "id": key}, projection)
+    if post is None:
+        post = await db.blog_posts.find_one({"published": True, "slug": key}, projection)
+    return post
+
+@app.get("/api/blog/{key}")
+async def get_blog_post(key: str, request: Request):
+    """A post by id or slug with its table of contents and the first rendered sections."""
+    async def load():
+        post = await find_published_post(key, {
+            **BLOG_DETAIL_PROJECTION, "sections": {"$slice": BLOG_SETTINGS["INITIAL_SECTIONS"]},
+        })
+        if post is None:
+            raise HTTPException(status_code=404, detail="Blog post not found")
+        return post
+    return await cached_list(request, "blog_posts", load)
+
+@app.get("/api/blog/{key}/sections")
+async def get_blog_sections(
+    key: str,
+    request: Request,
+    start: int = Query(0, ge=0),
+    limit: int = Query(BLOG_SETTINGS["INITIAL_SECTIONS"], ge=1, le=BLOG_SETTINGS["MAX_SECTIONS"]),
+):
+    """Rendered sections ``start`` .. ``start + limit - 1`` of a long post."""
+    async def load():
+        post = await find_published_post(key, {"_id": 0, "id": 1, "sections": {"$slice": [start, limit]}})
+        if post is None:
+            raise HTTPException(status_code=404, detail="Blog post not found")
+        return {"id": post["id"], "start": start, "sections": post.get("sections", [])}
+    return await cached_list(request, "blog_posts", load, start=start, limit=limit)
 
 @app.get("/api/skills")
-async def get_skills():
-    skills = []
-    async for skill in db.skills.find():
-        skill["id"] = str(skill["_id"])
-        del skill["_id"]
-        skills.append(skill)
-    return skills
+async def get_skills(request: Request):
+    return await cached_list(request, "skills", load_skills)
 
 @app.get("/api/experience")
-async def get_experience():
-    experiences = []
-    async for exp in db.experiences.find():
-        exp["id"] = str(exp["_id"])
-        del exp["_id"]
-        experiences.append(exp)
-    return experiences
+async def get_experience(request: Request):
+    return await cached_list(request, "experiences", load_experience)
+
+@app.get("/api/portfolio")
+async def get_portfolio(request: Request, sections: Optional[str] = None):
+    """Projects, blog posts, skills and experience in one response."""
+    names = tuple(PORTFOLIO_SECTIONS)
+    if sections:
+        requested = {name.strip() for name in sections.split(",") if name.strip()}
+        unknown = requested - set(PORTFOLIO_SECTIONS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(sorted(unknown))}")
+        names = tuple(name for name in PORTFOLIO_SECTIONS if name in requested)
+    return cached_response(request, await portfolio_snapshot.get(names))
+
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, alias="type", pattern="^(project|blog)$"),
+    limit: int = Query(20, ge=1, le=100),
+    prefix: bool = True,
+):
+    # A stale index still answers; the refresh runs in the background.
+    await response_cache.sync(db)
+    if search_refresher.stale():
+        search_refresher.schedule()
+    return search_index.search(q, limit=limit, kind=kind, prefix=prefix)
 
 # Admin endpoints
-@app.post("/api/admin/login", response_model=Token)
+@app.post("/api/admin/login", response_model=Token, dependencies=[Depends(login_admission)])
 async def admin_login(form_data: OAuth2PasswordRequestForm = Depends()):
     admin = await db.admin_users.find_one({"email": form_data.username})
-    if not admin or not verify_password(form_data.password, admin["password"]):
+    if not admin or not await verify_password(form_data.password, admin["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -254,35 +1682,394 @@ async def admin_login(form_data: OAuth2PasswordRequestForm = Depends()):
 async def create_project(project: Project, current_user: str = Depends(get_current_user)):
     project.id = str(uuid.uuid4())
     project.created_at = datetime.utcnow()
-    await db.projects.insert_one(project.dict())
-    return {"message": "Project created successfully"}
+    doc = project.dict()
+    await attach_image(doc)
+    await db.projects.insert_one(dict(doc))
+    await content_changed("projects", "project", doc)
+    return {"message": "Project created successfully", "id": project.id}
 
 @app.put("/api/admin/projects/{project_id}")
 async def update_project(project_id: str, project: Project, current_user: str = Depends(get_current_user)):
-    await db.projects.update_one({"id": project_id}, {"$set": project.dict()})
+    doc = project.dict(exclude={"id", "created_at"})
+    await attach_image(doc)
+    updated = await db.projects.find_one_and_update(
+        {"id": project_id},
+        {"$set": doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    await content_changed("projects", "project", updated, removed_id=project_id)
     return {"message": "Project updated successfully"}
 
 @app.delete("/api/admin/projects/{project_id}")
 async def delete_project(project_id: str, current_user: str = Depends(get_current_user)):
     await db.projects.delete_one({"id": project_id})
+    await content_changed("projects", "project", removed_id=project_id)
     return {"message": "Project deleted successfully"}
 
 @app.post("/api/admin/blog")
 async def create_blog_post(post: BlogPost, current_user: str = Depends(get_current_user)):
     post.id = str(uuid.uuid4())
     post.created_at = datetime.utcnow()
-    await db.blog_posts.insert_one(post.dict())
-    return {"message": "Blog post created successfully"}
+    doc = post.dict()
+    await attach_image(doc)
+    await prepare_blog_post(post.id, doc)
+    await db.blog_posts.insert_one(dict(doc))
+    await content_changed("blog_posts", "blog", doc)
+    return {"message": "Blog post created successfully", "id": post.id, "slug": doc["slug"]}
+
+@app.put("/api/admin/blog/{post_id}")
+async def update_blog_post(post_id: str, post: BlogPost, current_user: str = Depends(get_current_user)):
+    existing = await db.blog_posts.find_one(
+        {"id": post_id}, {"_id": 0, "slug": 1, "content_hash": 1, "render_version": 1})
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Blog post not found")
+    doc = post.dict(exclude={"id", "created_at"})
+    await attach_image(doc)
+    await prepare_blog_post(post_id, doc, existing)
+    updated = await db.blog_posts.find_one_and_update(
+        {"id": post_id},
+        {"$set": doc},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    await content_changed("blog_posts", "blog", updated, removed_id=post_id)
+    return {"message": "Blog post updated successfully", "slug": doc["slug"]}
+
+# Media
+MEDIA_SETTINGS = {
+    "MAX_UPLOAD_BYTES": int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024))),
+    "CHUNK_BYTES": 255 * 1024,  # GridFS default chunk size
+}
+
+def media_bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name="media")
+
+def media_url(file_id) -> str:
+    return f"/api/media/{file_id}"
+
+def image_fields(variants: List[dict]) -> dict:
+    """The image variants, srcset strings (one per format) and JPEG fallback ``image_url`` for a media item."""
+    variants = [{"url": v["url"], "width": v["width"], "format": v["format"]} for v in variants]
+    srcset = {}
+    for variant in variants:
+        srcset.setdefault(variant["format"], []).append(f"{variant['url']} {variant['width']}w")
+    fields = {
+        "image_variants": variants,
+        "image_srcset": {fmt: ", ".join(entries) for fmt, entries in srcset.items()},
+    }
+    jpegs = [v for v in variants if v["format"] == "jpeg"]
+    if jpegs:
+        fields["image_url"] = max(jpegs, key=lambda v: v["width"])["url"]
+    return fields
+
+async def find_media_variants(image_ids) -> Dict[str, List[dict]]:
+    """Media id -> stored variants, for every id in ``image_ids`` that exists."""
+    cursor = db.media.find({"id": {"$in": list(image_ids)}}, {"_id": 0, "id": 1, "variants": 1})
+    return {item["id"]: item["variants"] async for item in cursor}
+
+async def attach_image(doc: dict):
+    """Fill image variants, srcset strings and a JPEG fallback ``image_url`` from ``image_id``."""
+    if not doc.get("image_id"):
+        return
+    item = await db.media.find_one({"id": doc["image_id"]}, {"_id": 0, "variants": 1})
+    if item is None:
+        raise HTTPException(status_code=400, detail=f"Unknown image_id: {doc['image_id']}")
+    doc.update(image_fields(item["variants"]))
+
+@app.post("/api/admin/media")
+async def upload_media(file: UploadFile = File(...), current_user: str = Depends(get_current_user)):
+    """Store an image original in GridFS along with resized WebP/JPEG variants."""
+    data = await file.read(MEDIA_SETTINGS["MAX_UPLOAD_BYTES"] + 1)
+    if len(data) > MEDIA_SETTINGS["MAX_UPLOAD_BYTES"]:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    digest = hashlib.sha256(data).hexdigest()
+    existing = await db.media.find_one({"sha256": digest}, {"_id": 0})
+    if existing:
+        return existing
+    try:
+        info, variants = await asyncio.to_thread(media.render_variants, data)
+    except media.MediaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bucket = media_bucket()
+    media_id = str(uuid.uuid4())
+
+    async def store(filename: str, content: bytes, content_type: str, variant: str) -> ObjectId:
+        return await bucket.upload_from_stream(filename, content, metadata={
+            "media_id": media_id,
+            "variant": variant,
+            "content_type": content_type,
+            "etag": '"' + hashlib.sha256(content).hexdigest() + '"',
+        })
+
+    original_id = await store(file.filename or media_id, data, info["content_type"], "original")
+    stored = []
+    for variant in variants:
+        name = f"{variant['width']}w.{variant['format']}"
+        file_id = await store(f"{media_id}/{name}", variant["data"], variant["content_type"], name)
+        stored.append({
+            "url": media_url(file_id),
+            "width": variant["width"],
+            "height": variant["height"],
+            "format": variant["format"],
+            "size": len(variant["data"]),
+        })
+    item = {
+        "id": media_id,
+        "sha256": digest,
+        "filename": file.filename,
+        "width": info["width"],
+        "height": info["height"],
+        "original_url": media_url(original_id),
+        "variants": stored,
+        "created_at": datetime.utcnow(),
+    }
+    await db.media.insert_one(dict(item))
+    return item
+
+@app.get("/api/media/{file_id}")
+async def get_media(file_id: str, request: Request):
+    """Stream a stored file from GridFS, honouring Range and If-None-Match."""
+    try:
+        grid_out = await media_bucket().open_download_stream(ObjectId(file_id))
+    except (InvalidId, NoFile):
+        raise HTTPException(status_code=404, detail="Media not found")
+    metadata = grid_out.metadata or {}
+    etag = metadata.get("etag") or f'"{file_id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # File ids are never reused for different content.
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = grid_out.length
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = media.parse_range(range_header, size)
+    except media.MediaError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+    status_code = 206 if byte_range else 200
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+
+    async def body():
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(remaining, MEDIA_SETTINGS["CHUNK_BYTES"]))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    return StreamingResponse(body(), status_code=status_code, headers=headers,
+                             media_type=metadata.get("content_type", "application/octet-stream"))
+
+@app.get("/api/admin/analytics")
+async def get_analytics(
+    kind: Optional[str] = Query(None, alias="type", pattern="^(project|blog)$"),
+    target_id: Optional[str] = Query(None, alias="id"),
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: str = Depends(get_current_user),
+):
+    """Totals per project/post over the last ``days`` days, most viewed first.
+
+    With ``id``, that item's daily rollups instead. Events still buffered
+    in a worker show up after its next flush.
+    """
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    query = {"day": {"$gte": since}}
+    if kind:
+        query["kind"] = kind
+    if target_id:
+        query["target_id"] = target_id
+        rollups = db.analytics_daily.find(query, {"_id": 0}).sort("day", ASCENDING)
+        return {"since": since, "days": [doc async for doc in rollups]}
+    pipeline = analytics.totals_pipeline(query) + [{"$sort": {"view": -1}}, {"$limit": limit}]
+    items = [
+        {"type": row["_id"]["kind"], "id": row["_id"]["target_id"],
+         **{event: row.get(event) or 0 for event in analytics.ALL_EVENTS}}
+        async for row in db.analytics_daily.aggregate(pipeline)
+    ]
+    return {"since": since, "items": items}
+
+# Bulk writes
+BULK_SETTINGS = {
+    "BATCH_SIZE": int(os.getenv("BULK_BATCH_SIZE", "1000")),
+    # Per-item errors listed in the response; the rest are only counted.
+    "MAX_REPORTED_ERRORS": int(os.getenv("BULK_MAX_REPORTED_ERRORS", "1000")),
+}
+
+# URL name -> (collection, model)
+BULK_COLLECTIONS = {
+    "projects": ("projects", Project),
+    "blog": ("blog_posts", BlogPost),
+    "skills": ("skills", Skill),
+    "experience": ("experiences", Experience),
+}
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'document'}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+def bulk_operation(model, item, now: datetime, media: Dict[str, List[dict]], content_hashes: Dict[str, str]):
+    """Turn one NDJSON item into an upsert (default) or, with ``"op": "delete"``, a delete keyed on ``id``.
+
+    ``media`` holds the variants of the batch's image ids, which fill in
+    the image fields the way attach_image does for single writes, and
+    ``content_hashes`` the stored content hash of the batch's blog posts.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each line must be a JSON object")
+    op = item.pop("op", "upsert")
+    if op == "delete":
+        if not item.get("id"):
+            raise ValueError("Delete needs an id")
+        return DeleteOne({"id": str(item["id"])})
+    if op != "upsert":
+        raise ValueError(f"Unknown op: {op}")
+    doc = model.model_validate(item).dict()
+    doc_id = doc.pop("id") or str(uuid.uuid4())
+    if doc.get("image_id"):
+        if doc["image_id"] not in media:
+            raise ValueError(f"Unknown image_id: {doc['image_id']}")
+        doc.update(image_fields(media[doc["image_id"]]))
+    if model is BlogPost and not doc["slug"]:
+        del doc["slug"]
+    update = {"$set": doc}
+    if model is BlogPost and content_hashes.get(doc_id) != blog_render.content_hash(doc["content"]):
+        # Rendered (off the event loop) by render_stale_posts once the batch is written.
+        update["$unset"] = {"render_version": ""}
+    if "created_at" in doc and doc["created_at"] is None:
+        del doc["created_at"]
+        update["$setOnInsert"] = {"created_at": now}
+    return UpdateOne({"id": doc_id}, update, upsert=True)
+
+async def iter_request_lines(request: Request):
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+@app.post("/api/admin/{collection}/bulk")
+async def bulk_write_collection(collection: str, request: Request, current_user: str = Depends(get_current_user)):
+    """Apply an NDJSON body of upserts/deletes with unordered bulk writes."""
+    if collection not in BULK_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {collection}")
+    name, model = BULK_COLLECTIONS[collection]
+    summary = {"received": 0, "upserted": 0, "modified": 0, "deleted": 0, "error_count": 0, "errors": []}
+    items, ops, op_lines = [], [], []
+
+    def record_error(line_no: int, error: str):
+        summary["error_count"] += 1
+        if len(summary["errors"]) < BULK_SETTINGS["MAX_REPORTED_ERRORS"]:
+            summary["errors"].append({"line": line_no, "error": error})
+
+    async def flush():
+        image_ids = {item.get("image_id") for _, item in items if isinstance(item, dict)} - {None}
+        media = await find_media_variants(image_ids) if image_ids else {}
+        content_hashes = {}
+        if model is BlogPost:
+            post_ids = [str(item["id"]) for _, item in items if isinstance(item, dict) and item.get("id")]
+            async for post in db.blog_posts.find({"id": {"$in": post_ids}}, {"_id": 0, "id": 1, "content_hash": 1}):
+                content_hashes[post["id"]] = post.get("content_hash")
+        for line_no, item in items:
+            try:
+                ops.append(bulk_operation(model, item, now, media, content_hashes))
+                op_lines.append(line_no)
+            except ValueError as e:
+                record_error(line_no, describe_error(e))
+        items.clear()
+        if not ops:
+            return
+        try:
+            result = (await db[name].bulk_write(ops, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for write_error in result.get("writeErrors", []):
+                record_error(op_lines[write_error["index"]], write_error.get("errmsg", "Write failed"))
+        summary["upserted"] += result.get("nUpserted", 0)
+        summary["modified"] += result.get("nModified", 0)
+        summary["deleted"] += result.get("nRemoved", 0)
+        ops.clear()
+        op_lines.clear()
+
+    now = datetime.utcnow()
+    line_no = 0
+    async for line in iter_request_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        summary["received"] += 1
+        try:
+            items.append((line_no, json.loads(line)))
+        except ValueError as e:
+            record_error(line_no, describe_error(e))
+        if len(items) >= BULK_SETTINGS["BATCH_SIZE"]:
+            await flush()
+    await flush()
+
+    if name == "blog_posts":
+        await render_stale_posts()
+    if summary["upserted"] or summary["modified"] or summary["deleted"]:
+        await content_changed(name)
+    return summary
 
 @app.get("/api/admin/contacts")
-async def get_contacts(current_user: str = Depends(get_current_user)):
-    contacts = []
-    async for contact in db.contacts.find():
-        contact["id"] = str(contact["_id"])
-        del contact["_id"]
-        contacts.append(contact)
-    return contacts
+async def get_contacts(
+    limit: Optional[int] = PageLimit,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: str = Depends(get_current_user),
+):
+    projection = parse_fields(fields, ContactMessage)
+    if limit:
+        return await find_page(db.contacts, {}, limit, after, projection)
+    # The inbox (or the rest of it after a cursor) is streamed as a JSON
+    # array rather than built in memory.
+    cursor = stream_cursor(db.contacts, after_query({}, after), PAGE_SORT, projection)
+    return StreamingResponse(iter_json_array(cursor), media_type="application/json")
+
+@app.get("/api/admin/contacts/export")
+async def export_contacts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = Query(None, description="Only messages created after this instant"),
+    start: Optional[datetime] = Query(None, description="Created at or after"),
+    end: Optional[datetime] = Query(None, description="Created before"),
+    current_user: str = Depends(get_current_user),
+):
+    created_at = {}
+    if since:
+        created_at["$gt"] = since
+    if start:
+        created_at["$gte"] = start
+    if end:
+        created_at["$lt"] = end
+    query = {"created_at": created_at} if created_at else {}
+    cursor = stream_cursor(db.contacts, query, [("created_at", ASCENDING), ("id", ASCENDING)])
+    filename = f"contacts-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "csv":
+        return StreamingResponse(iter_csv(cursor, CONTACT_COLUMNS), media_type="text/csv", headers=headers)
+    return StreamingResponse(iter_ndjson(cursor), media_type="application/x-ndjson", headers=headers)
 
 if __name__ == "__main__":
+    # A single process for development; production runs serve.py.
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Static JSON snapshots of the public API, for nginx or a CDN to serve.
+
+    python snapshot.py [--output DIR] [--force]
+
+Every snapshot file is named after a hash of its content and written
+next to a gzip copy (for ``gzip_static``), so it can be cached forever.
+``manifest.json`` maps API paths to those files and is the only file that
+changes in place. Both kinds of write go through a temporary file and
+``os.replace``, so a reader sees the old file or the new one, never a
+partial one.
+
+Paths are built in groups that each depend on some collections. The
+manifest records the collection versions each group was built from, and
+a build only redoes groups whose versions have moved.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger("portfolio.snapshot")
+
+MANIFEST = "manifest.json"
+UNSAFE_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+# group -> (source collections, async generator of (api path, JSON body))
+Groups = Dict[str, Tuple[List[str], Callable[[], AsyncIterator[Tuple[str, bytes]]]]]
+
+
+def atomic_write(path: str, data: bytes):
+    tmp = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def file_name(api_path: str, body: bytes) -> str:
+    """``/api/blog/some-post`` -> ``api/blog/some-post.<hash>.json``."""
+    parts = [UNSAFE_RE.sub("_", part) for part in api_path.strip("/").split("/")]
+    return "/".join(parts) + "." + hashlib.sha256(body).hexdigest()[:16] + ".json"
+
+
+class SnapshotStore:
+    """Snapshot files and the manifest in one directory.
+
+    Files the manifest no longer references are deleted once they are
+    ``keep_seconds`` old, so a reader holding the previous manifest can
+    still fetch what it points at.
+    """
+
+    def __init__(self, directory: str, keep_seconds: float = 600):
+        self.directory = directory
+        self.keep_seconds = keep_seconds
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, MANIFEST), "rb") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"groups": {}, "files": {}}
+
+    def write(self, api_path: str, body: bytes) -> dict:
+        name = file_name(api_path, body)
+        path = os.path.join(self.directory, name)
+        # Same name, same content: an unchanged response costs no write.
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path + ".gz", gzip.compress(body, 9, mtime=0))
+            atomic_write(path, body)
+        return {"file": name, "bytes": len(body)}
+
+    def commit(self, groups: Dict[str, dict]) -> dict:
+        """Merge rebuilt ``groups`` into the manifest on disk and swap it in.
+
+        Another process may have committed since this build started; a
+        group it built from newer versions than ours is kept.
+        """
+        manifest = self.load_manifest()
+        for name, group in groups.items():
+            current = manifest["groups"].get(name)
+            if current and current["versions"] != group["versions"] and all(
+                    current["versions"].get(c, -1) >= v for c, v in group["versions"].items()):
+                continue
+            manifest["groups"][name] = group
+        manifest["files"] = {path: entry["file"]
+                             for group in manifest["groups"].values() for path, entry in group["files"].items()}
+        manifest["generated_at"] = datetime.utcnow().isoformat()
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(os.path.join(self.directory, MANIFEST),
+                     json.dumps(manifest, separators=(",", ":"), sort_keys=True).encode())
+        return manifest
+
+    def collect_garbage(self, manifest: dict) -> int:
+        referenced = set(manifest["files"].values())
+        referenced |= {name + ".gz" for name in referenced}
+        cutoff = time.time() - self.keep_seconds
+        removed = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if relative == MANIFEST or relative in referenced:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class SnapshotBuilder:
+    """Rebuilds the groups whose source collections changed.
+
+    ``versions()`` returns the current ``{collection: version}``. Versions
+    are read before the data, so a write that lands mid-build leaves the
+    group marked stale for the next build rather than lost.
+    """
+
+    def __init__(self, store: SnapshotStore, groups: Groups,
+                 versions: Callable[[], Awaitable[Dict[str, int]]]):
+        self.store = store
+        self.groups = groups
+        self.versions = versions
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        self._task = None
+
+    def _stale(self, manifest: dict, name: str, versions: Dict[str, int]) -> bool:
+        built = manifest["groups"].get(name)
+        if built is None or built["versions"] != versions:
+            return True
+        return not all(os.path.exists(os.path.join(self.store.directory, entry["file"]))
+                       for entry in built["files"].values())
+
+    async def build(self, force: bool = False) -> List[str]:
+        """Rebuild stale groups (all of them with ``force``). Returns their names."""
+        async with self._lock:
+            current = await self.versions()
+            manifest = await asyncio.to_thread(self.store.load_manifest)
+            rebuilt = {}
+            for name, (collections, loader) in self.groups.items():
+                versions = {c: current.get(c, 0) for c in collections}
+                if not force and not await asyncio.to_thread(self._stale, manifest, name, versions):
+                    continue
+                files = {}
+                async for path, body in loader():
+                    files[path] = await asyncio.to_thread(self.store.write, path, body)
+                rebuilt[name] = {"versions": versions, "files": files}
+            if rebuilt:
+                manifest = await asyncio.to_thread(self.store.commit, rebuilt)
+                await asyncio.to_thread(self.store.collect_garbage, manifest)
+                logger.info("Snapshots rebuilt: %s", ", ".join(rebuilt))
+            return list(rebuilt)
+
+    def schedule(self):
+        """Start a build in the background; calls during a build coalesce into one more."""
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self.build()
+            except Exception:
+                logger.exception("Snapshot build failed")
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def main(args):
+    if args.output:
+        os.environ["SNAPSHOT_DIR"] = args.output
+    import server  # settings are read at import, after the environment is prepared
+    if server.snapshot_builder is None:
+        raise SystemExit("Set SNAPSHOT_DIR or pass --output")
+    rebuilt = await server.snapshot_builder.build(force=args.force)
+    print(f"Rebuilt: {', '.join(rebuilt)}" if rebuilt else "Snapshots are up to date")
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write static JSON snapshots of the public API. Only changed groups are rebuilt.")
+    parser.add_argument("--output", help="snapshot directory (default: SNAPSHOT_DIR)")
+    parser.add_argument("--force", action="store_true", help="rebuild every group")
+    asyncio.run(main(parser.parse_args()))
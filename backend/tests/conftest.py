@@ -0,0 +1,16 @@
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The app on an in-memory database, with a fresh response cache."""
+    mock = AsyncMongoMockClient()
+    monkeypatch.setattr(server, "client", mock)
+    monkeypatch.setattr(server, "db", mock.portfolio_db)
+    monkeypatch.setattr(server, "response_cache", server.ResponseCache(300, 100, 0))
+    with TestClient(server.app) as test_client:
+        yield test_client
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from analytics import Analytics, rollup_id
+
+
+class FailingRollups:
+    """Stands in for ``database.analytics_daily`` and fails every bulk write."""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def bulk_write(self, ops, ordered=True):
+        self.calls += 1
+        raise self.error
+
+
+class Database:
+    def __init__(self, analytics_daily):
+        self.analytics_daily = analytics_daily
+
+
+def record(tracker: Analytics):
+    tracker.add("project", "p1", "view")
+    tracker.add("project", "p1", "view")
+    tracker.add("project", "p1", "github")
+    tracker.add("blog", "b1", "view")
+
+
+def test_flush_writes_daily_rollups():
+    database = AsyncMongoMockClient().portfolio_db
+    tracker = Analytics(max_keys=100, popularity_days=30)
+    record(tracker)
+
+    async def scenario():
+        assert await tracker.flush(database) == 4
+        assert await tracker.flush(database) == 0
+        record(tracker)
+        await tracker.flush(database)
+        return await database.analytics_daily.find({}, {"_id": 1, "counts": 1}).to_list(None)
+
+    rollups = {doc["_id"]: doc["counts"] for doc in asyncio.run(scenario())}
+    assert tracker.pending() == 0
+    day = next(iter(rollups)).split(":")[0]
+    assert rollups[rollup_id(day, "project", "p1")] == {"view": 4, "github": 2}
+    assert rollups[rollup_id(day, "blog", "b1")] == {"view": 2}
+
+
+@pytest.mark.parametrize("error", [AutoReconnect("down"), asyncio.CancelledError()])
+def test_failed_or_cancelled_flush_puts_the_counts_back(error):
+    tracker = Analytics(max_keys=100, popularity_days=30)
+    record(tracker)
+    expected = dict(tracker._counts)
+
+    async def scenario():
+        with pytest.raises(type(error)):
+            await tracker.flush(Database(FailingRollups(error)))
+        # Events recorded while the write was in flight are kept too.
+        tracker.add("blog", "b1", "view")
+
+    asyncio.run(scenario())
+    assert tracker.pending() == 5
+    for key, amount in expected.items():
+        assert tracker._counts[key] == amount + (1 if key[1:] == ("blog", "b1", "view") else 0)
+
+
+def test_partially_failed_flush_keeps_only_the_failed_rollups():
+    tracker = Analytics(max_keys=100, popularity_days=30)
+    record(tracker)
+    # Rollups are written in insertion order: project p1, then blog b1.
+    error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "boom"}], "nInserted": 0})
+
+    async def scenario():
+        return await tracker.flush(Database(FailingRollups(error)))
+
+    assert asyncio.run(scenario()) == 3
+    assert [key[1:] for key in tracker._counts] == [("blog", "b1", "view")]
+    assert tracker.pending() == 1
+
+
+def test_buffer_is_bounded():
+    tracker = Analytics(max_keys=2, popularity_days=30)
+    assert tracker.add("project", "a", "view")
+    assert tracker.add("project", "b", "view")
+    assert tracker.add("project", "a", "view")
+    assert not tracker.add("project", "c", "view")
+    assert tracker.dropped == 1
+    assert tracker.pending() == 3
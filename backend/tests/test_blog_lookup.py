@@ -0,0 +1,27 @@
+"""Resolving /api/blog/{key} when a key is both an id and a slug."""
+import server
+
+
+def add_post(client, post_id: str, slug: str):
+    client.portal.call(server.db.blog_posts.insert_one, {
+        "id": post_id, "slug": slug, "title": post_id, "content": "Body", "excerpt": "",
+        "sections": [], "published": True,
+    })
+
+
+def test_slugs_avoid_existing_ids(client):
+    add_post(client, "2", "first-post")
+    assert client.portal.call(server.unique_slug, "2", "new") == "2-2"
+    assert client.portal.call(server.unique_slug, "2", "2") == "2"
+    assert client.portal.call(server.unique_slugs, {"new": "2", "other": "2"}) == {"new": "2-2", "other": "2-3"}
+    assert client.portal.call(server.unique_slugs, {"2": "2"}) == {"2": "2"}
+
+
+def test_an_id_wins_over_another_posts_slug(client):
+    add_post(client, "2", "first-post")
+    add_post(client, "imported", "2")
+    assert client.get("/api/blog/2").json()["id"] == "2"
+    assert client.get("/api/blog/2/sections").json()["id"] == "2"
+    assert client.get("/api/blog/first-post").json()["id"] == "2"
+    assert client.get("/api/blog/imported").json()["id"] == "imported"
+    assert client.get("/api/blog/missing").status_code == 404
@@ -0,0 +1,53 @@
+import pytest
+
+import blog_render
+from blog_render import render_post
+
+
+def html(content: str) -> str:
+    return "".join(section["html"] for section in render_post(content)["sections"])
+
+
+def test_raw_html_is_escaped():
+    out = html('Hello <script>alert("x")</script> and <img src=x onerror=alert(1)>')
+    assert "<script>" not in out and "<img" not in out
+    assert "&lt;script&gt;" in out
+
+
+def test_html_block_is_escaped():
+    out = html('<div onclick="steal()">\nhi\n</div>')
+    assert "<div" not in out
+    assert "&lt;div" in out
+
+
+@pytest.mark.parametrize("href", [
+    "javascript:alert(1)",
+    "JaVaScRiPt:alert(1)",
+    "vbscript:msgbox(1)",
+    "data:text/html;base64,PHNjcmlwdD4=",
+])
+def test_unsafe_link_schemes_are_not_linked(href):
+    out = html(f"[click]({href}) and <{href}>")
+    assert "href" not in out
+    assert "click" in out
+
+
+def test_safe_links_get_rel_for_external_targets():
+    out = html("[site](https://example.com) and [about](/about)")
+    assert '<a href="https://example.com" rel="nofollow noopener noreferrer">site</a>' in out
+    assert '<a href="/about">about</a>' in out
+
+
+def test_sections_split_at_top_level_headings():
+    post = render_post("Intro.\n\n# One\n\ntext\n\n## Two\n\n- # not a section\n\n## Two\n\nmore")
+    assert [section["id"] for section in post["sections"]] == ["intro", "one", "two", "two-2"]
+    assert post["toc"][1] == {"id": "one", "title": "One"}
+    assert post["render_version"] == blog_render.RENDER_VERSION
+    assert post["content_hash"] == blog_render.content_hash("Intro.\n\n# One\n\ntext\n\n## Two\n\n- # not a section\n\n## Two\n\nmore")
+
+
+def test_reading_time_is_at_least_a_minute():
+    assert render_post("short")["reading_time"] == 1
+    long = render_post(" ".join(["word"] * (blog_render.WORDS_PER_MINUTE * 3)))
+    assert long["word_count"] == blog_render.WORDS_PER_MINUTE * 3
+    assert long["reading_time"] == 3
@@ -0,0 +1,249 @@
+"""The email outbox against an in-process SMTP server and a mock Mongo."""
+import asyncio
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from server import MailSender, MailUnavailable, OutboxWorker, outbox_record
+
+SETTINGS = {
+    "BATCH_SIZE": 5,
+    "POLL_SECONDS": 0.05,
+    "MAX_ATTEMPTS": 3,
+    "BACKOFF_SECONDS": 30,
+    "MAX_BACKOFF_SECONDS": 100,
+    "LEASE_SECONDS": 300,
+    "SMTP_IDLE_SECONDS": 60,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def smtp_settings(port: int) -> dict:
+    return {"SMTP_SERVER": "127.0.0.1", "SMTP_PORT": port, "SMTP_STARTTLS": False,
+            "SMTP_USER": "", "SMTP_PASSWORD": None, "FROM_EMAIL": "site@example.com"}
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, smtp_server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, smtp_server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp():
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield inbox, controller.port
+    controller.stop()
+
+
+@pytest.fixture
+def database():
+    return AsyncMongoMockClient().portfolio_db
+
+
+def worker_for(port: int, **settings) -> OutboxWorker:
+    return OutboxWorker(MailSender(smtp_settings(port), 60), {**SETTINGS, **settings})
+
+
+async def queue(database, count=1, **fields):
+    records = [{**outbox_record("owner@example.com", f"Subject {i}", f"<p>{i}</p>"), **fields} for i in range(count)]
+    await database.email_outbox.insert_many(records)
+    return records
+
+
+def test_drain_sends_each_due_record_once(smtp, database):
+    inbox, port = smtp
+    worker = worker_for(port)
+
+    async def scenario():
+        await queue(database, 7)
+        await queue(database, 1, next_attempt_at=datetime.utcnow() + timedelta(hours=1))
+        assert await worker.drain(database) == 7
+        assert await worker.drain(database) == 0
+
+    asyncio.run(scenario())
+    worker.sender.close()
+    assert len(inbox.messages) == 7
+    assert inbox.messages[0].rcpt_tos == ["owner@example.com"]
+    statuses = asyncio.run(database.email_outbox.distinct("status"))
+    assert sorted(statuses) == ["pending", "sent"]
+
+
+def test_claim_leases_a_record_to_one_worker(database):
+    worker = worker_for(free_port())
+
+    async def scenario():
+        await queue(database)
+        first = await worker.claim(database)
+        second = await worker.claim(database)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["status"] == "sending"
+    assert first["lease_until"] > datetime.utcnow() + timedelta(seconds=SETTINGS["LEASE_SECONDS"] - 5)
+    assert second is None
+
+
+def test_expired_lease_is_claimed_again(database):
+    worker = worker_for(free_port())
+
+    async def scenario():
+        now = datetime.utcnow()
+        await queue(database, 1, status="sending", lease_until=now + timedelta(minutes=1))
+        stuck, = await queue(database, 1, status="sending", lease_until=now - timedelta(seconds=1))
+        claimed = await worker.claim(database)
+        return stuck, claimed, await worker.claim(database)
+
+    stuck, claimed, nothing = asyncio.run(scenario())
+    assert claimed["id"] == stuck["id"]
+    assert nothing is None
+
+
+def test_failed_send_is_retried_with_backoff(database):
+    # Nothing listens on this port, so every send fails.
+    worker = worker_for(free_port(), BACKOFF_SECONDS=30, MAX_BACKOFF_SECONDS=100)
+
+    async def attempt():
+        assert await worker.drain(database) == 0
+        return await database.email_outbox.find_one({})
+
+    async def scenario():
+        await queue(database)
+        delays = []
+        for _ in range(2):
+            before = datetime.utcnow()
+            record = await attempt()
+            delays.append((record["next_attempt_at"] - before).total_seconds())
+            # Make it due again instead of waiting out the backoff.
+            await database.email_outbox.update_one({"_id": record["_id"]}, {"$set": {"next_attempt_at": before}})
+        return record, delays
+
+    record, delays = asyncio.run(scenario())
+    assert record["status"] == "pending"
+    assert record["attempts"] == 2
+    assert record["last_error"]
+    assert "lease_until" not in record
+    assert 29 < delays[0] < 31 and 59 < delays[1] < 61
+
+
+def test_backoff_is_capped(database):
+    worker = worker_for(free_port(), MAX_ATTEMPTS=10, BACKOFF_SECONDS=30, MAX_BACKOFF_SECONDS=100)
+
+    async def scenario():
+        await queue(database, 1, attempts=4)
+        before = datetime.utcnow()
+        await worker.drain(database)
+        record = await database.email_outbox.find_one({})
+        return (record["next_attempt_at"] - before).total_seconds()
+
+    assert 99 < asyncio.run(scenario()) < 101
+
+
+def test_record_is_dead_lettered_after_max_attempts(database):
+    worker = worker_for(free_port(), MAX_ATTEMPTS=3)
+
+    async def scenario():
+        await queue(database, 1, attempts=2)
+        assert await worker.drain(database) == 0
+        record = await database.email_outbox.find_one({})
+        return record, await worker.claim(database)
+
+    record, claimed = asyncio.run(scenario())
+    assert record["status"] == "dead"
+    assert record["attempts"] == 3
+    assert claimed is None
+
+
+def test_run_stops_after_the_batch_in_hand(smtp, database):
+    inbox, port = smtp
+    worker = worker_for(port)
+
+    async def scenario():
+        task = asyncio.create_task(worker.run(database))
+        await queue(database, 2)
+        worker.notify()
+        for _ in range(100):
+            if len(inbox.messages) == 2:
+                break
+            await asyncio.sleep(0.02)
+        worker.stop()
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(scenario())
+    worker.sender.close()
+    assert len(inbox.messages) == 2
+
+
+def test_contact_stored_without_notification_is_queued_once(database):
+    contact = {"id": "c1", "name": "Ada", "email": "ada@example.com", "subject": "Hi", "message": "Hello",
+               "created_at": datetime.utcnow(), "notification_queued": False}
+
+    async def scenario():
+        await database.contacts.insert_one(dict(contact))
+        assert await server.queue_missed_notifications(database) == 1
+        assert await server.queue_missed_notifications(database) == 0
+        # Queueing again (say the flag update was lost) does not add a second email.
+        await server.queue_contact_notification(database, contact)
+        return await database.email_outbox.find({}, {"_id": 0}).to_list(None)
+
+    records = asyncio.run(scenario())
+    assert len(records) == 1
+    assert records[0]["contact_id"] == "c1"
+    assert "Ada" in records[0]["message"]
+
+
+def test_unreachable_server_hands_back_the_rest_of_the_batch(database):
+    worker = worker_for(free_port())
+    connects = []
+    connect = worker.sender._connect
+    worker.sender._connect = lambda: connects.append(1) or connect()
+
+    async def scenario():
+        await queue(database, 4)
+        assert await worker.drain(database) == 0
+        return await database.email_outbox.find({}, {"_id": 0}).to_list(None)
+
+    records = asyncio.run(scenario())
+    assert len(connects) == 1
+    tried = [record for record in records if record["attempts"]]
+    assert len(tried) == 1 and tried[0]["status"] == "pending"
+    untouched = [record for record in records if not record["attempts"]]
+    assert len(untouched) == 3
+    assert all(record["status"] == "pending" and "lease_until" not in record for record in untouched)
+    assert all(record["next_attempt_at"] <= datetime.utcnow() for record in untouched)
+
+
+def test_rejected_message_does_not_stop_the_batch(smtp, database):
+    inbox, port = smtp
+    worker = worker_for(port)
+
+    async def scenario():
+        await queue(database, 2)
+        bad, = await queue(database, 1, to_email="bounce@example.com")
+        await worker.drain(database)
+        return bad, await database.email_outbox.find_one({"id": bad["id"]})
+
+    bad, record = asyncio.run(scenario())
+    worker.sender.close()
+    assert len(inbox.messages) == 2
+    assert record["attempts"] == 1 and record["status"] == "pending"
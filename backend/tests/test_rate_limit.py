@@ -0,0 +1,86 @@
+from rate_limit import DuplicateFilter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_reports_wait():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.take("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take("a") == 0.5
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    for _ in range(3):
+        bucket.take("a")
+    clock.now += 1
+    assert bucket.take("a") == 0.0
+    assert bucket.take("a") == 0.0
+    assert bucket.take("a") > 0
+    clock.now += 60
+    assert [bucket.take("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take("a") > 0
+
+
+def test_bucket_keys_are_independent():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, burst=1, clock=clock)
+    assert bucket.take("a") == 0.0
+    assert bucket.take("a") > 0
+    assert bucket.take("b") == 0.0
+
+
+def test_bucket_cost_and_zero_rate():
+    clock = FakeClock()
+    assert TokenBucket(rate=1, burst=5, clock=clock).take("a", cost=6) == 1.0
+    empty = TokenBucket(rate=0, burst=1, clock=clock)
+    assert empty.take("a") == 0.0
+    assert empty.take("a") == float("inf")
+
+
+def test_bucket_evicts_least_recently_used_key():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, burst=1, max_keys=2, clock=clock)
+    bucket.take("a")
+    bucket.take("b")
+    bucket.take("a")
+    bucket.take("c")
+    assert list(bucket._buckets) == ["a", "c"]
+    # An evicted key starts again with a full bucket.
+    assert bucket.take("b") == 0.0
+
+
+def test_duplicate_filter_window():
+    clock = FakeClock()
+    duplicates = DuplicateFilter(window=60, clock=clock)
+    assert not duplicates.seen("x")
+    assert duplicates.seen("x")
+    assert not duplicates.seen("y")
+    clock.now += 61
+    assert not duplicates.seen("x")
+    assert duplicates.seen("x")
+
+
+def test_duplicate_filter_forget():
+    duplicates = DuplicateFilter(window=60, clock=FakeClock())
+    duplicates.seen("x")
+    duplicates.forget("x")
+    duplicates.forget("never seen")
+    assert not duplicates.seen("x")
+
+
+def test_duplicate_filter_bounded():
+    duplicates = DuplicateFilter(window=60, max_entries=3, clock=FakeClock())
+    for digest in "abcd":
+        duplicates.seen(digest)
+    assert len(duplicates._seen) <= 3
+    assert not duplicates.seen("a")
+    assert duplicates.seen("d")
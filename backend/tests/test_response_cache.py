@@ -0,0 +1,65 @@
+"""Conditional GETs on the cached public list endpoints."""
+import time
+
+import server
+
+
+def add_skill(client, skill_id: str):
+    client.portal.call(server.db.skills.insert_one, {"id": skill_id, "name": skill_id, "category": "tools", "level": 3})
+    client.portal.call(server.response_cache.bump, server.db, "skills")
+
+
+def test_list_carries_validators_and_answers_304(client):
+    add_skill(client, "git")
+    response = client.get("/api/skills")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    again = client.get("/api/skills", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    assert client.get("/api/skills", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/api/skills", headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get("/api/skills", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client):
+    add_skill(client, "git")
+    last_modified = client.get("/api/skills").headers["last-modified"]
+    assert client.get("/api/skills", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/skills", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+    assert client.get("/api/skills", headers={"If-Modified-Since": "yesterday"}).status_code == 200
+
+
+def test_a_write_changes_the_etag(client):
+    add_skill(client, "git")
+    etag = client.get("/api/skills").headers["etag"]
+    add_skill(client, "docker")
+    response = client.get("/api/skills", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert {skill["id"] for skill in response.json()} == {"git", "docker"}
+
+
+def test_unknown_query_parameters_share_the_entry(client):
+    add_skill(client, "git")
+    etag = client.get("/api/skills").headers["etag"]
+    response = client.get("/api/skills?utm_source=mail&cb=123", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert [key for key in server.response_cache._entries if key.startswith("/api/skills")] == ["/api/skills?"]
+
+
+def test_older_versions_are_ignored():
+    cache = server.ResponseCache(300, 100, 0)
+    cache.apply_version("skills", 3, None)
+    cache._entries["/api/skills?"] = server.CachedResponse("skills", 3, b"[]", 0.0, time.monotonic() + 300)
+    cache.apply_version("skills", 2, None)
+    cache.apply_version("skills", 3, None)
+    assert cache.version("skills")[0] == 3
+    assert "/api/skills?" in cache._entries
+    cache.apply_version("skills", 4, None)
+    assert cache.version("skills")[0] == 4
+    assert "/api/skills?" not in cache._entries
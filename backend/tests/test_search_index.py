@@ -0,0 +1,213 @@
+import math
+import random
+
+import search_index
+from search_index import SearchIndex
+
+FIELDS = {
+    "project": {"title": 3.0, "technologies": 2.0, "description": 1.0},
+    "blog": {"title": 3.0, "tags": 2.0, "content": 1.0},
+}
+FACETS = {"project": ["technologies"], "blog": ["tags"]}
+
+WORDS = "react python fastapi docker redis linux mongo rust kafka vue".split()
+
+
+def project(doc_id, title, technologies=(), description=""):
+    return {"id": doc_id, "title": title, "technologies": list(technologies), "description": description}
+
+
+def add(index, kind, doc):
+    index.add(kind, doc, {"title": doc["title"]})
+
+
+def build(docs):
+    index = SearchIndex(FIELDS, FACETS)
+    for kind, doc in docs:
+        add(index, kind, doc)
+    return index
+
+
+def ids(result):
+    return [hit["id"] for hit in result["results"]]
+
+
+def brute_force(docs, query):
+    """Plain BM25 over ``docs`` (exact terms only), best first."""
+    analysed = []
+    for kind, doc in docs:
+        terms = {}
+        for field, weight in FIELDS[kind].items():
+            value = doc.get(field) or ""
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in search_index.tokenize(text):
+                terms[token] = terms.get(token, 0.0) + weight
+        analysed.append((doc["id"], terms, sum(terms.values())))
+    average = sum(length for _, _, length in analysed) / len(analysed)
+    scores = {}
+    for token in search_index.tokenize(query):
+        matching = [entry for entry in analysed if token in entry[1]]
+        if not matching:
+            continue
+        idf = math.log(1 + (len(analysed) - len(matching) + 0.5) / (len(matching) + 0.5))
+        for doc_id, terms, length in matching:
+            tf = terms[token]
+            norm = tf * (search_index.K1 + 1) / (tf + search_index.K1 * (1 - search_index.B + search_index.B * length / average))
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def synthetic(count, seed=7):
+    rng = random.Random(seed)
+    return [("project", project(f"p{i}", " ".join(rng.sample(WORDS, 2)), rng.sample(WORDS, 3),
+                                " ".join(rng.choices(WORDS, k=rng.randint(3, 30)))))
+            for i in range(count)]
+
+
+def test_title_match_ranks_first_and_facets_are_counted():
+    index = build([
+        ("project", project("a", "Redis cache", ["python"], "keeps things fast")),
+        ("project", project("b", "Chat app", ["python", "redis"], "uses redis pub/sub")),
+        ("project", project("c", "Blog", ["go"], "static site")),
+    ])
+    result = index.search("redis", prefix=False)
+    assert ids(result) == ["a", "b"]
+    assert result["total"] == 2 and result["total_exact"]
+    assert result["facets"] == {"technologies": {"python": 2, "redis": 1}}
+    assert result["results"][0]["title"] == "Redis cache"
+
+
+def test_prefix_expands_only_the_last_token():
+    index = build([
+        ("project", project("a", "FastAPI service")),
+        ("project", project("b", "Fast build")),
+    ])
+    assert set(ids(index.search("fas"))) == {"a", "b"}
+    assert ids(index.search("fas", prefix=False)) == []
+    assert ids(index.search("fastapi build", prefix=False)) != []
+
+
+def test_kind_filter_and_stopwords():
+    index = build([
+        ("project", project("a", "Python tools")),
+        ("blog", {"id": "b", "title": "Python tips", "tags": [], "content": ""}),
+    ])
+    assert ids(index.search("python", kind="blog")) == ["b"]
+    assert index.search("the and of")["results"] == []
+
+
+def test_top_results_match_brute_force_bm25():
+    docs = synthetic(400)
+    # Built in one go, so the impacts use the exact average length.
+    pairs = [(doc, {"title": doc["title"]}) for _, doc in docs]
+    index = SearchIndex(FIELDS, FACETS).rebuild(([], {}), {"project": (pairs, 1)})
+    for query in ["react", "python docker", "linux docker redis", "kafka vue rust mongo"]:
+        expected = brute_force(docs, query)[:10]
+        result = index.search(query, limit=10, prefix=False)
+        assert len(result["results"]) == len(expected)
+        for hit, (_, score) in zip(result["results"], expected):
+            assert math.isclose(hit["score"], score, abs_tol=1e-4)
+
+
+def test_scores_stay_correct_after_writes():
+    docs = synthetic(300)
+    index = build(docs)
+    index.search("python docker", prefix=False)  # score the lists before patching them
+    rng = random.Random(1)
+    for i in rng.sample(range(300), 40):
+        index.remove("project", docs[i][1]["id"])
+    kept = [doc for doc in docs if ("project", doc[1]["id"]) in index]
+    added = synthetic(40, seed=2)
+    for n, (kind, doc) in enumerate(added):
+        doc["id"] = f"new{n}"
+        add(index, kind, doc)
+    expected = brute_force(kept + added, "python docker")[:10]
+    result = index.search("python docker", limit=10, prefix=False)
+    # Patched impacts use an average length within STATS_TOLERANCE of the true one.
+    for hit, (_, score) in zip(result["results"], expected):
+        assert math.isclose(hit["score"], score, rel_tol=0.01)
+
+
+def test_add_replaces_and_remove_forgets():
+    index = build([("project", project("a", "Rust parser"))])
+    add(index, "project", project("a", "Go parser"))
+    assert len(index) == 1
+    assert ids(index.search("rust", prefix=False)) == []
+    assert ids(index.search("go", prefix=False)) == ["a"]
+    index.remove("project", "a")
+    index.remove("project", "missing")
+    assert ("project", "a") not in index
+    assert index.search("parser")["total"] == 0
+
+
+def test_results_are_not_served_stale_after_a_write():
+    index = build([("project", project("a", "Kafka consumer"))])
+    assert ids(index.search("kafka")) == ["a"]
+    add(index, "project", project("b", "Kafka producer"))
+    assert set(ids(index.search("kafka"))) == {"a", "b"}
+
+
+def test_rebuild_replaces_kinds_and_keeps_the_rest():
+    index = build([
+        ("project", project("a", "Docker images")),
+        ("blog", {"id": "b", "title": "Docker tips", "tags": [], "content": ""}),
+    ])
+    index.versions = {"project": 1, "blog": 1}
+    replacement = [({"id": "c", "title": "Docker compose", "tags": ["ops"], "content": ""}, {"title": "Docker compose"})]
+    rebuilt = index.rebuild(index.carry_over(["blog"]), {"blog": (replacement, 2)})
+    assert rebuilt.versions == {"project": 1, "blog": 2}
+    assert set(ids(rebuilt.search("docker"))) == {"a", "c"}
+    # The old index is untouched and can keep answering until it is swapped out.
+    assert set(ids(index.search("docker"))) == {"a", "b"}
+
+
+def test_total_is_a_lower_bound_when_not_exact(monkeypatch):
+    monkeypatch.setattr(search_index, "EXACT_TOTAL_POSTINGS", 0)
+    monkeypatch.setattr(search_index, "SCAN_LIMIT", 50)
+    docs = synthetic(500)
+    index = build(docs)
+    result = index.search("python docker", prefix=False)
+    assert not result["total_exact"]
+    assert 50 <= result["total"] <= len(brute_force(docs, "python docker"))
+
+
+def brute_force_facets(docs, query):
+    matched = {doc_id for doc_id, _ in brute_force(docs, query)}
+    counts = {}
+    for kind, doc in docs:
+        if doc["id"] in matched:
+            for name in FACETS[kind]:
+                for value in doc.get(name) or []:
+                    counts.setdefault(name, {}).setdefault(value, 0)
+                    counts[name][value] += 1
+    return counts
+
+
+def test_facets_cover_every_match_when_the_total_is_exact():
+    docs = synthetic(300)
+    index = build(docs)
+    for query in ["react", "python docker"]:
+        result = index.search(query, limit=5, prefix=False)
+        assert result["total_exact"] and result["facets_exact"]
+        assert result["facets"] == brute_force_facets(docs, query)
+
+
+def test_facet_counts_follow_writes():
+    docs = synthetic(200)
+    index = build(docs)
+    index.search("rust", prefix=False)  # count the term's facets before patching them
+    for kind, doc in docs[:30]:
+        index.remove(kind, doc["id"])
+    added = [("project", project("n1", "Rust CLI", ["rust", "clap"])), ("project", project("n2", "Rust web", ["rust"]))]
+    for kind, doc in added:
+        add(index, kind, doc)
+    assert index.search("rust", prefix=False)["facets"] == brute_force_facets(docs[30:] + added, "rust")
+
+
+def test_facets_are_flagged_when_only_the_best_hits_are_counted(monkeypatch):
+    monkeypatch.setattr(search_index, "EXACT_TOTAL_POSTINGS", 0)
+    monkeypatch.setattr(search_index, "SCAN_LIMIT", 50)
+    index = build(synthetic(500))
+    result = index.search("python docker", prefix=False)
+    assert not result["facets_exact"]
+    assert sum(result["facets"]["technologies"].values()) == 3 * search_index.FACET_DEPTH
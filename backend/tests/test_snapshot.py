@@ -0,0 +1,123 @@
+import asyncio
+import gzip
+import json
+import os
+
+from snapshot import MANIFEST, SnapshotBuilder, SnapshotStore
+
+
+class Source:
+    """Collections with a version counter and a loader per group that counts its runs."""
+
+    def __init__(self):
+        self.versions = {"projects": 1, "blog_posts": 1}
+        self.data = {"projects": ["p1"], "blog_posts": ["b1", "b2"]}
+        self.loads = {"projects": 0, "blog": 0}
+
+    async def current_versions(self):
+        return dict(self.versions)
+
+    def loader(self, group, collection, prefix):
+        async def load():
+            self.loads[group] += 1
+            yield f"/api/{prefix}", json.dumps(self.data[collection]).encode()
+            for item in self.data[collection]:
+                yield f"/api/{prefix}/{item}", json.dumps({"id": item}).encode()
+        return load
+
+    def groups(self):
+        return {
+            "projects": (["projects"], self.loader("projects", "projects", "projects")),
+            "blog": (["blog_posts"], self.loader("blog", "blog_posts", "blog")),
+        }
+
+
+def builder_for(directory, source, keep_seconds=600):
+    return SnapshotBuilder(SnapshotStore(str(directory), keep_seconds), source.groups(), source.current_versions)
+
+
+def manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+def test_first_build_writes_every_group_with_gzip_copies(tmp_path):
+    source = Source()
+    assert sorted(asyncio.run(builder_for(tmp_path, source).build())) == ["blog", "projects"]
+    files = manifest(tmp_path)["files"]
+    assert set(files) == {"/api/projects", "/api/projects/p1", "/api/blog", "/api/blog/b1", "/api/blog/b2"}
+    body = (tmp_path / files["/api/blog"]).read_bytes()
+    assert json.loads(body) == ["b1", "b2"]
+    assert gzip.decompress((tmp_path / (files["/api/blog"] + ".gz")).read_bytes()) == body
+
+
+def test_only_groups_whose_versions_moved_are_rebuilt(tmp_path):
+    source = Source()
+    builder = builder_for(tmp_path, source)
+    asyncio.run(builder.build())
+    assert asyncio.run(builder.build()) == []
+    source.versions["blog_posts"] = 2
+    source.data["blog_posts"].append("b3")
+    assert asyncio.run(builder.build()) == ["blog"]
+    assert source.loads == {"projects": 1, "blog": 2}
+    files = manifest(tmp_path)["files"]
+    assert "/api/blog/b3" in files and "/api/projects/p1" in files
+    assert asyncio.run(builder.build(force=True)) == ["projects", "blog"]
+
+
+def test_unchanged_bodies_keep_their_files(tmp_path):
+    source = Source()
+    builder = builder_for(tmp_path, source)
+    asyncio.run(builder.build())
+    before = manifest(tmp_path)["files"]
+    source.versions["blog_posts"] = 2
+    source.data["blog_posts"] = ["b1"]
+    asyncio.run(builder.build())
+    after = manifest(tmp_path)["files"]
+    assert after["/api/blog/b1"] == before["/api/blog/b1"]
+    assert after["/api/blog"] != before["/api/blog"]
+    assert "/api/blog/b2" not in after
+
+
+def test_missing_file_makes_its_group_stale(tmp_path):
+    source = Source()
+    builder = builder_for(tmp_path, source)
+    asyncio.run(builder.build())
+    os.remove(tmp_path / manifest(tmp_path)["files"]["/api/projects/p1"])
+    assert asyncio.run(builder.build()) == ["projects"]
+    assert (tmp_path / manifest(tmp_path)["files"]["/api/projects/p1"]).exists()
+
+
+def test_unreferenced_files_are_collected_after_keep_seconds(tmp_path):
+    source = Source()
+    builder = builder_for(tmp_path, source, keep_seconds=0)
+    asyncio.run(builder.build())
+    old = manifest(tmp_path)["files"]["/api/blog"]
+    os.utime(tmp_path / old, (0, 0))
+    os.utime(tmp_path / (old + ".gz"), (0, 0))
+    source.versions["blog_posts"] = 2
+    source.data["blog_posts"] = ["b9"]
+    asyncio.run(builder.build())
+    assert not (tmp_path / old).exists() and not (tmp_path / (old + ".gz")).exists()
+    for name in manifest(tmp_path)["files"].values():
+        assert (tmp_path / name).exists()
+
+
+def test_commit_keeps_a_group_built_from_newer_versions(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.commit({"blog": {"versions": {"blog_posts": 5}, "files": {"/api/blog": {"file": "new.json", "bytes": 1}}}})
+    store.commit({"blog": {"versions": {"blog_posts": 4}, "files": {"/api/blog": {"file": "old.json", "bytes": 1}}}})
+    assert manifest(tmp_path)["files"] == {"/api/blog": "new.json"}
+
+
+def test_scheduled_builds_coalesce(tmp_path):
+    source = Source()
+    builder = builder_for(tmp_path, source)
+
+    async def scenario():
+        for _ in range(5):
+            builder.schedule()
+        await builder.wait()
+
+    asyncio.run(scenario())
+    assert source.loads == {"projects": 1, "blog": 1}
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { HiCalendar, HiUser, HiTag, HiSearch } from 'react-icons/hi';
-import { portfolioAPI } from '../services/api';
+import { portfolioAPI, imageProps } from '../services/api';
 
 const Blog = () => {
   const [posts, setPosts] = useState([]);
@@ -162,7 +162,7 @@ const Blog = () => {
                   {/* Post Image */}
                   <div className="relative overflow-hidden rounded-lg mb-6">
                     <img
-                      src={post.image_url}
+                      {...imageProps(post)}
                       alt={post.title}
                       className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
                     />
@@ -173,7 +173,8 @@ const Blog = () => {
                     <HiCalendar className="mr-1" />
                     <span className="mr-4">{formatDate(post.created_at)}</span>
                     <HiUser className="mr-1" />
-                    <span>John Doe</span>
+                    <span className="mr-4">John Doe</span>
+                    {post.reading_time && <span>{post.reading_time} min read</span>}
                   </div>
 
                   {/* Post Title */}
@@ -204,7 +205,7 @@ const Blog = () => {
 
                   {/* Read More Link */}
                   <a
-                    href={`/blog/${post.id}`}
+                    href={`/blog/${post.slug || post.id}`}
                     className="text-primary-600 hover:text-primary-700 font-medium text-sm transition-colors"
                   >
                     Read More →
@@ -271,7 +272,7 @@ const Blog = () => {
                   className="flex items-start space-x-4 p-4 bg-gray-50 rounded-lg hover:bg-gray-100 transition-colors"
                 >
                   <img
-                    src={post.image_url}
+                    {...imageProps(post, '80px')}
                     alt={post.title}
                     className="w-20 h-20 object-cover rounded-lg flex-shrink-0"
                   />
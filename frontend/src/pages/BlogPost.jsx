@@ -0,0 +1,161 @@
+import React, { useState, useEffect, useRef } from 'react';
+import { Link, useParams } from 'react-router-dom';
+import { motion } from 'framer-motion';
+import { HiCalendar, HiClock, HiTag, HiArrowLeft } from 'react-icons/hi';
+import { portfolioAPI, imageProps, trackEvent } from '../services/api';
+
+const BlogPost = () => {
+  const { slug } = useParams();
+  const [post, setPost] = useState(null);
+  const [sections, setSections] = useState([]);
+  const [loading, setLoading] = useState(true);
+  const [notFound, setNotFound] = useState(false);
+  const loadingMore = useRef(false);
+  const sentinel = useRef(null);
+
+  useEffect(() => {
+    const fetchPost = async () => {
+      setLoading(true);
+      try {
+        const response = await portfolioAPI.getBlogPost(slug);
+        setPost(response.data);
+        setSections(response.data.sections);
+        setNotFound(false);
+        trackEvent('blog', response.data.id);
+      } catch (error) {
+        console.error('Error fetching blog post:', error);
+        setNotFound(true);
+      }
+      setLoading(false);
+    };
+
+    fetchPost();
+  }, [slug]);
+
+  const hasMore = post && sections.length < post.toc.length;
+
+  // Long posts arrive a few sections at a time; fetch the rest as the
+  // reader nears the end of what is on screen.
+  useEffect(() => {
+    if (!hasMore || !sentinel.current) return undefined;
+
+    const observer = new IntersectionObserver(async ([entry]) => {
+      if (!entry.isIntersecting || loadingMore.current) return;
+      loadingMore.current = true;
+      try {
+        const response = await portfolioAPI.getBlogSections(post.id, sections.length);
+        setSections((current) => [...current, ...response.data.sections]);
+      } catch (error) {
+        console.error('Error fetching blog post sections:', error);
+      }
+      loadingMore.current = false;
+    }, { rootMargin: '800px' });
+
+    observer.observe(sentinel.current);
+    return () => observer.disconnect();
+  }, [hasMore, post, sections.length]);
+
+  const formatDate = (dateString) => {
+    return new Date(dateString).toLocaleDateString('en-US', {
+      year: 'numeric',
+      month: 'long',
+      day: 'numeric'
+    });
+  };
+
+  if (loading) {
+    return (
+      <div className="min-h-screen flex items-center justify-center">
+        <div className="loading-spinner"></div>
+      </div>
+    );
+  }
+
+  if (notFound) {
+    return (
+      <div className="min-h-screen flex flex-col items-center justify-center gap-6">
+        <p className="text-gray-600 dark:text-gray-300 text-lg">This post could not be found.</p>
+        <Link to="/blog" className="btn-primary">Back to the blog</Link>
+      </div>
+    );
+  }
+
+  return (
+    <div className="min-h-screen bg-gray-50 dark:bg-gray-900">
+      <article className="section-padding">
+        <div className="max-w-3xl mx-auto">
+          <Link
+            to="/blog"
+            className="inline-flex items-center text-primary-600 hover:text-primary-700 font-medium text-sm mb-8"
+          >
+            <HiArrowLeft className="mr-1" />
+            All posts
+          </Link>
+
+          <motion.header initial={{ opacity: 0, y: 20 }} animate={{ opacity: 1, y: 0 }} className="mb-10">
+            <h1 className="mb-6 text-gray-900 dark:text-white">{post.title}</h1>
+            <div className="flex flex-wrap items-center text-sm text-gray-500 dark:text-gray-400 gap-4 mb-6">
+              <span className="inline-flex items-center">
+                <HiCalendar className="mr-1" />
+                {formatDate(post.created_at)}
+              </span>
+              <span className="inline-flex items-center">
+                <HiClock className="mr-1" />
+                {post.reading_time} min read
+              </span>
+            </div>
+            <div className="flex flex-wrap gap-2">
+              {post.tags.map((tag) => (
+                <span
+                  key={tag}
+                  className="inline-flex items-center px-2 py-1 bg-primary-100 text-primary-800 text-xs rounded-full"
+                >
+                  <HiTag className="mr-1" />
+                  {tag}
+                </span>
+              ))}
+            </div>
+          </motion.header>
+
+          {post.image_url && (
+            <img
+              {...imageProps(post, '(min-width: 768px) 768px, 100vw')}
+              alt={post.title}
+              className="w-full rounded-lg mb-10"
+            />
+          )}
+
+          {post.toc.filter((entry) => entry.title).length > 2 && (
+            <nav className="card mb-10">
+              <h2 className="text-lg font-semibold mb-3">Contents</h2>
+              <ol className="space-y-1 text-sm">
+                {post.toc.filter((entry) => entry.title).map((entry) => (
+                  <li key={entry.id}>
+                    <a href={`#${entry.id}`} className="text-primary-600 hover:text-primary-700">
+                      {entry.title}
+                    </a>
+                  </li>
+                ))}
+              </ol>
+            </nav>
+          )}
+
+          {/* Sanitized on the server when the post is saved */}
+          <div className="post-content text-gray-700 dark:text-gray-300 leading-relaxed">
+            {sections.map((section) => (
+              <section key={section.id} dangerouslySetInnerHTML={{ __html: section.html }} />
+            ))}
+          </div>
+
+          {hasMore && (
+            <div ref={sentinel} className="flex justify-center py-10">
+              <div className="loading-spinner"></div>
+            </div>
+          )}
+        </div>
+      </article>
+    </div>
+  );
+};
+
+export default BlogPost;
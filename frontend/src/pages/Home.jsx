@@ -14,14 +14,10 @@ const Home = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [projectsRes, skillsRes, experienceRes] = await Promise.all([
-          portfolioAPI.getProjects(),
-          portfolioAPI.getSkills(),
-          portfolioAPI.getExperience()
-        ]);
-        setProjects(projectsRes.data.slice(0, 3)); // Show only 3 featured projects
-        setSkills(skillsRes.data);
-        setExperience(experienceRes.data.slice(0, 2)); // Show only 2 recent experiences
+        const { data } = await portfolioAPI.getPortfolio(['projects', 'skills', 'experience']);
+        setProjects(data.projects.slice(0, 3)); // Show only 3 featured projects
+        setSkills(data.skills);
+        setExperience(data.experience.slice(0, 2)); // Show only 2 recent experiences
       } catch (error) {
         console.error('Error fetching data:', error);
       }
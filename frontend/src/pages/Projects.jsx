@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { HiExternalLink, HiCode, HiSearch } from 'react-icons/hi';
 import { FaGithub } from 'react-icons/fa';
-import { portfolioAPI } from '../services/api';
+import { portfolioAPI, imageProps, trackEvent } from '../services/api';
 
 const Projects = () => {
   const [projects, setProjects] = useState([]);
@@ -188,12 +188,14 @@ const Projects = () => {
                 <motion.div
                   key={project.id}
                   variants={itemVariants}
+                  viewport={{ once: true }}
+                  onViewportEnter={() => trackEvent('project', project.id)}
                   className="card hover-lift group"
                 >
                   {/* Project Image */}
                   <div className="relative overflow-hidden rounded-lg mb-4">
                     <img
-                      src={project.image_url}
+                      {...imageProps(project)}
                       alt={project.title}
                       className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
                     />
@@ -232,6 +234,7 @@ const Projects = () => {
                         href={project.github_url}
                         target="_blank"
                         rel="noopener noreferrer"
+                        onClick={() => trackEvent('project', project.id, 'github')}
                         className="flex items-center text-gray-600 hover:text-primary-600 transition-colors"
                       >
                         <FaGithub className="mr-1" />
@@ -243,6 +246,7 @@ const Projects = () => {
                         href={project.live_url}
                         target="_blank"
                         rel="noopener noreferrer"
+                        onClick={() => trackEvent('project', project.id, 'live')}
                         className="flex items-center text-gray-600 hover:text-primary-600 transition-colors"
                       >
                         <HiExternalLink className="mr-1" />
@@ -9,14 +9,85 @@ const api = axios.create({
   },
 });
 
+// Static snapshots of the public endpoints (backend/snapshot.py), served by
+// nginx or a CDN. Leave REACT_APP_SNAPSHOT_URL unset to always use the API.
+const SNAPSHOT_BASE_URL = import.meta.env.REACT_APP_SNAPSHOT_URL;
+const MANIFEST_MAX_AGE_MS = 60 * 1000;
+let manifest = null;
+
+const loadManifest = () => {
+  if (!manifest || Date.now() - manifest.fetchedAt > MANIFEST_MAX_AGE_MS) {
+    manifest = {
+      fetchedAt: Date.now(),
+      files: axios.get(`${SNAPSHOT_BASE_URL}/manifest.json`)
+        .then((response) => response.data.files)
+        .catch(() => ({})),
+    };
+  }
+  return manifest.files;
+};
+
+// Read ``path`` from its snapshot when there is one, otherwise call ``live``.
+const fromSnapshot = async (path, live, pick = (data) => data) => {
+  if (SNAPSHOT_BASE_URL) {
+    try {
+      const file = (await loadManifest())[path];
+      if (file) {
+        const response = await axios.get(`${SNAPSHOT_BASE_URL}/${file}`);
+        return { ...response, data: pick(response.data) };
+      }
+    } catch (error) {
+      // Missing or unreachable snapshot: fall back to the API.
+    }
+  }
+  return live();
+};
+
 // API methods
 export const portfolioAPI = {
   // Public endpoints
-  getProjects: () => api.get('/api/projects'),
-  getBlogPosts: () => api.get('/api/blog'),
-  getSkills: () => api.get('/api/skills'),
-  getExperience: () => api.get('/api/experience'),
+  // Home page data in one request; sections: any of projects, blog, skills, experience
+  getPortfolio: (sections) => fromSnapshot(
+    '/api/portfolio',
+    () => api.get('/api/portfolio', {
+      params: sections ? { sections: sections.join(',') } : {},
+    }),
+    (data) => (sections ? Object.fromEntries(sections.map((name) => [name, data[name]])) : data),
+  ),
+  getProjects: () => fromSnapshot('/api/projects', () => api.get('/api/projects')),
+  getBlogPosts: () => fromSnapshot('/api/blog', () => api.get('/api/blog')),
+  // One post by id or slug, with its first rendered sections and a table of
+  // contents (all sections when served from a snapshot)
+  getBlogPost: (key) => fromSnapshot(`/api/blog/${key}`, () => api.get(`/api/blog/${encodeURIComponent(key)}`)),
+  getBlogSections: (key, start, limit) => api.get(`/api/blog/${encodeURIComponent(key)}/sections`, {
+    params: { start, limit },
+  }),
+  getSkills: () => fromSnapshot('/api/skills', () => api.get('/api/skills')),
+  getExperience: () => fromSnapshot('/api/experience', () => api.get('/api/experience')),
   submitContact: (data) => api.post('/api/contact', data),
 };
 
+// Count a view or link click. sendBeacon survives navigation away from the
+// page and, posting plain text, needs no CORS preflight.
+export const trackEvent = (type, id, event = 'view') => {
+  const body = JSON.stringify({ type, id, event });
+  const url = `${API_BASE_URL}/api/track`;
+  if (navigator.sendBeacon && navigator.sendBeacon(url, body)) return;
+  fetch(url, { method: 'POST', body, keepalive: true }).catch(() => {});
+};
+
+// Responsive <img> attributes for a project or blog post. Uploaded media
+// URLs are relative to the API, so they get the API base prepended.
+export const imageProps = (item, sizes = '(min-width: 768px) 33vw, 100vw') => {
+  const withBase = (url) => (url && url.startsWith('/api/') ? `${API_BASE_URL}${url}` : url);
+  const srcSet = item.image_srcset?.webp || item.image_srcset?.jpeg;
+  return {
+    src: withBase(item.image_url),
+    ...(srcSet && {
+      srcSet: srcSet.split(', ').map((entry) => withBase(entry)).join(', '),
+      sizes,
+    }),
+  };
+};
+
 export default api;
\ No newline at end of file